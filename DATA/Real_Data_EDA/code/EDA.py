@@ -8,6 +8,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 import re
+import sys
+
+# Survey normalization lives with the API code (FastApi/survey.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "FastApi"))
+from survey import clean_survey
 
 # Helper function to sanitize filenames
 def sanitize_filename(name):
@@ -18,11 +23,15 @@ def sanitize_filename(name):
 
 # 1. Load the dataset
 
-def load_data(path: Path) -> pd.DataFrame:
+def load_data(path: Path, clean: bool = True) -> pd.DataFrame:
     """
     Load the CSV data, standardize column names, and return a DataFrame.
+    Spellings of the same answer are merged and repeat submissions dropped first.
     """
     df = pd.read_csv(path)
+    if clean:
+        df, report = clean_survey(df)
+        print(f"Dropped {report['duplicates']} duplicate submissions")
     # Rename CGPA to GPA for consistency
     if 'CGPA' in df.columns:
         df = df.rename(columns={'CGPA': 'GPA'})
@@ -104,14 +113,15 @@ def correlation_matrix(df: pd.DataFrame, output_dir: Path = None):
 # 8. Categorical feature analysis
 
 def analyze_categorical(df: pd.DataFrame, output_dir: Path = None):
-    cat_cols = df.select_dtypes(include=['object']).columns
+    cat_cols = df.select_dtypes(include=['object', 'category']).columns
     for col in cat_cols:
         print(f"\n--- {col} ---")
         print(df[col].value_counts())
         if 'GPA' in df.columns:
             try:
-                df[col] = df[col].astype(str)
-                group = df.groupby(col)['GPA'].mean().sort_values()
+                if df[col].dtype == object:
+                    df[col] = df[col].astype(str)
+                group = df.groupby(col, observed=True)['GPA'].mean().sort_values()
                 print("\nMean GPA by category:")
                 print(group)
                 plt.figure(figsize=(8,4))
@@ -151,7 +161,7 @@ def pairwise_plots(df: pd.DataFrame, top_n: int = 5, output_dir: Path = None):
 
 # 10. Main EDA function
 
-def run_eda(data_path: str, output_dir: str = None):
+def run_eda(data_path: str, output_dir: str = None, clean: bool = True):
     path = Path(data_path)
     if not path.exists():
         raise FileNotFoundError(f"Data file not found: {path}")
@@ -159,7 +169,7 @@ def run_eda(data_path: str, output_dir: str = None):
     if out_dir and not out_dir.exists():
         out_dir.mkdir(parents=True)
 
-    df = load_data(path)
+    df = load_data(path, clean)
     overview(df)
     summary_stats(df)
     missing_values(df)
@@ -177,5 +187,6 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run EDA on Margadarshak dataset')
     parser.add_argument('data_path', nargs='?', default=default_data_path, help='Path to the CSV file')
     parser.add_argument('--output_dir', '-o', default=default_output_dir, help='Directory to save plots')
+    parser.add_argument('--raw', action='store_true', help='Skip answer normalization and deduplication')
     args = parser.parse_args()
-    run_eda(args.data_path, args.output_dir)
+    run_eda(args.data_path, args.output_dir, clean=not args.raw)
@@ -4,6 +4,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import os
+import sys
+
+# Survey normalization lives with the API code (FastApi/survey.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "FastApi"))
+from survey import clean_survey
 
 # Set the file path directly
 FILE_PATH = "/Users/omanchaudhary/Margadarshak Updates/synthetic_student_survey_data.csv"
@@ -253,7 +258,8 @@ def main():
     if not os.path.exists(FILE_PATH):
         print(f"File not found at path: {FILE_PATH}")
         return
-    df = load_data(FILE_PATH)
+    df, report = clean_survey(load_data(FILE_PATH))
+    print(f"Dropped {report['duplicates']} duplicate submissions")
     generate_report(df)
 
 if __name__ == "__main__":
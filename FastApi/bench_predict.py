@@ -0,0 +1,137 @@
+"""Micro-benchmarks for the /predict I/O path.
+
+Compares the original dict + jsonable_encoder + JSONResponse response path
+against the pre-encoded one, in isolation and end to end through the ASGI
+app, per-row cost of /predict against /predict/batch, bootstrap intervals
+from one stacked matrix multiply against a loop over K models, and the
+flattened tree engine (forest.py) against sklearn's own predict.
+
+    python bench_predict.py
+"""
+import asyncio
+import json
+import random
+import time
+import timeit
+import warnings
+
+warnings.filterwarnings("ignore")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import numpy as np
+
+import main
+from ensemble import LinearEnsemble
+from forest import FlatForest
+from scoring import FEATURES, clip_prediction, generate_recommendations, mask_from_ids, recommendation_ids
+from serialization import prediction_json
+
+SAMPLE = dict(repeated_course=1, attendance=65, part_time_job=1, motivation_level=4, first_generation=0, friends_performance=2)
+
+
+# The response path as it was before pre-encoding, kept here for comparison
+@main.app.post("/predict/legacy")
+def predict_legacy(data: main.InputData):
+    prediction = clip_prediction(main.get_model().predict(main.build_features(data))[0])
+    return {"predicted_cgpa": prediction, "recommendations": generate_recommendations(data, prediction)}
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def asgi_post_us(path: str, payload: dict, number: int, query: bytes = b"") -> float:
+    """Drive the ASGI app directly; TestClient's own overhead would swamp the difference."""
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def run():
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(number):
+                await main.app(dict(scope), receive, send)
+            best = min(best, time.perf_counter() - start)
+        return best / number * 1e6
+
+    return asyncio.run(run())
+
+
+def run_benchmarks():
+    data = main.InputData(**SAMPLE)
+    prediction = clip_prediction(main.get_model().predict(main.build_features(data))[0])
+
+    legacy = per_call_us(lambda: JSONResponse(jsonable_encoder(
+        {"predicted_cgpa": prediction, "recommendations": generate_recommendations(data, prediction)}
+    )).body, 20000)
+    fast = per_call_us(lambda: prediction_json(prediction, mask_from_ids(recommendation_ids(data, prediction))), 20000)
+    print(f"response encoding      legacy {legacy:8.2f} us   pre-encoded {fast:8.2f} us   ({legacy / fast:.1f}x)")
+
+    legacy = asgi_post_us("/predict/legacy", SAMPLE, 2000)
+    fast = asgi_post_us("/predict", SAMPLE, 2000)
+    print(f"POST end to end        legacy {legacy:8.2f} us   /predict    {fast:8.2f} us   ({legacy / fast:.1f}x)")
+
+    rows = 1000
+    random.seed(0)
+    batch = {name: [random.randint(0, 1) if name in ("repeated_course", "part_time_job", "first_generation")
+                    else random.randint(0, 10) for _ in range(rows)] for name in FEATURES}
+    one_by_one = asgi_post_us("/predict", SAMPLE, 2000)
+    batched = asgi_post_us("/predict/batch", batch, 20) / rows
+    print(f"per row ({rows} rows)    /predict {one_by_one:8.2f} us   /predict/batch {batched:8.2f} us   ({one_by_one / batched:.0f}x)")
+
+    # Without a trained ensemble.npz, jitter the served model's coefficients
+    k = 200
+    model = main.get_model()
+    if main.ensemble is None:
+        rng = np.random.default_rng(0)
+        main.ensemble = LinearEnsemble(
+            model.coef_[:, None] * rng.normal(1, 0.05, (len(FEATURES), k)),
+            model.intercept_ + rng.normal(0, 0.05, k),
+        )
+    k = main.ensemble.size
+    features = main.build_batch_features(main.BatchInputData(**batch))
+    models = [(main.ensemble.coef[:, i], main.ensemble.intercept[i]) for i in range(k)]
+    looped = per_call_us(lambda: np.column_stack([np.clip(features @ c + b, 0, 4) for c, b in models]), 20) / rows
+    stacked = per_call_us(lambda: main.ensemble.predict_all(features), 20) / rows
+    print(f"K={k} predictions/row  looped {looped:8.2f} us   stacked {stacked:8.2f} us   ({looped / stacked:.1f}x)")
+    plain = asgi_post_us("/predict", SAMPLE, 2000)
+    with_intervals = asgi_post_us("/predict", SAMPLE, 2000, b"intervals=true")
+    print(f"/predict               plain  {plain:8.2f} us   intervals  {with_intervals:8.2f} us")
+
+
+def run_forest_benchmarks(rows: int = 1000):
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+    rng = np.random.default_rng(0)
+    train = rng.integers(0, 11, (5000, len(FEATURES))).astype(float)
+    train[:, 1] = rng.uniform(0, 100, len(train))
+    target = main.get_model().predict(train) + rng.normal(0, 0.2, len(train))
+    features = train[:rows]
+    for model in (GradientBoostingRegressor(n_estimators=100, random_state=0),
+                  RandomForestRegressor(n_estimators=50, max_depth=10, n_jobs=1, random_state=0)):
+        model.fit(train, target)
+        flat = FlatForest.from_sklearn(model)
+        assert np.allclose(flat.predict(features), model.predict(features), rtol=0, atol=1e-12)
+        name = type(model).__name__
+        single = per_call_us(lambda: model.predict(features[:1]), 200), per_call_us(lambda: flat.predict(features[:1]), 200)
+        print(f"{name:26s} 1 row      sklearn {single[0]:8.2f} us   flat {single[1]:8.2f} us   ({single[0] / single[1]:.1f}x)")
+        batch = per_call_us(lambda: model.predict(features), 5) / rows, per_call_us(lambda: flat.predict(features), 5) / rows
+        print(f"{name:26s} {rows} rows  sklearn {batch[0]:8.2f} us   flat {batch[1]:8.2f} us per row")
+
+
+if __name__ == "__main__":
+    run_benchmarks()
+    run_forest_benchmarks()
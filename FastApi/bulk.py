@@ -0,0 +1,395 @@
+"""Streaming bulk scoring for cohort exports.
+
+Input is CSV (with a header naming the InputData fields), NDJSON (one InputData
+object per line) or an Arrow IPC stream. It is read incrementally, gathered
+into chunks of CHUNK_ROWS rows in the model's feature layout and every chunk
+is scored with a single vectorized model call. One result per input row is
+written as NDJSON or CSV as soon as its chunk is done, so memory stays bounded
+by the chunk size however large the file is.
+
+Each result carries the 0-based input row, the clipped predicted CGPA and the
+recommendation ids from scoring.RECOMMENDATIONS. Rows with missing or invalid
+values get an "error" instead.
+
+    python bulk.py cohort.csv -o scores.ndjson
+    cat cohort.ndjson | python bulk.py - --format ndjson --output-format csv
+
+Over HTTP, POST the file to /predict/bulk. Results stream back while the
+upload is still arriving, and clients that send the whole body before
+reading work too.
+"""
+import argparse
+import asyncio
+import csv
+import importlib.util
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from scoring import FEATURES, INTEGER_FEATURES, ids_from_mask, score_matrix
+
+# Arrow input is optional, and pyarrow is only imported once an Arrow file arrives
+HAVE_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+CHUNK_ROWS = 4096
+INPUT_FORMATS = ("csv", "ndjson", "arrow")
+OUTPUT_FORMATS = ("ndjson", "csv")
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".arrow": "arrow", ".arrows": "arrow"}
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+INVALID_ROW = "missing or invalid feature values"
+
+
+# ---------- parsing: every reader yields (n x FEATURES) float chunks, NaN = bad value ----------
+
+def _to_matrix(rows: list) -> np.ndarray:
+    try:
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURES))
+    except (TypeError, ValueError):
+        pass
+    # Slow path only for chunks that actually contain a bad value
+    matrix = np.full((len(rows), len(FEATURES)), np.nan)
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            try:
+                matrix[i, j] = float(value)
+            except (TypeError, ValueError):
+                pass
+    return matrix
+
+
+def iter_csv(fp, chunk_rows: int = CHUNK_ROWS):
+    reader = csv.reader(io.TextIOWrapper(fp, encoding="utf-8-sig", newline=""))
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    missing = [name for name in FEATURES if name not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    columns = [header.index(name) for name in FEATURES]
+    width = max(columns) + 1
+
+    rows = []
+    for record in reader:
+        if not record:
+            continue
+        if len(record) < width:
+            record = record + [""] * (width - len(record))
+        rows.append([record[c] for c in columns])
+        if len(rows) == chunk_rows:
+            yield _to_matrix(rows)
+            rows = []
+    if rows:
+        yield _to_matrix(rows)
+
+
+def iter_ndjson(fp, chunk_rows: int = CHUNK_ROWS):
+    rows = []
+    for line in fp:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            rows.append([record.get(name) for name in FEATURES])
+        except (ValueError, AttributeError):
+            rows.append([None] * len(FEATURES))
+        if len(rows) == chunk_rows:
+            yield _to_matrix(rows)
+            rows = []
+    if rows:
+        yield _to_matrix(rows)
+
+
+def iter_arrow(fp, chunk_rows: int = CHUNK_ROWS):
+    if not HAVE_ARROW:
+        raise RuntimeError("Arrow input needs pyarrow installed")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+
+    reader = pa.ipc.open_stream(fp)
+    missing = [name for name in FEATURES if name not in reader.schema.names]
+    if missing:
+        raise ValueError(f"Arrow schema is missing columns: {', '.join(missing)}")
+    for batch in reader:
+        columns = [
+            pc.cast(batch.column(name), pa.float64()).to_numpy(zero_copy_only=False)
+            for name in FEATURES
+        ]
+        matrix = np.column_stack(columns) if batch.num_rows else np.empty((0, len(FEATURES)))
+        for start in range(0, len(matrix), chunk_rows):
+            yield matrix[start:start + chunk_rows]
+
+
+READERS = {"csv": iter_csv, "ndjson": iter_ndjson, "arrow": iter_arrow}
+
+
+# ---------- scoring and output ----------
+
+def valid_rows(matrix: np.ndarray) -> np.ndarray:
+    ints = matrix[:, INTEGER_FEATURES]
+    return np.isfinite(matrix).all(axis=1) & (ints == np.floor(ints)).all(axis=1)
+
+
+def score_chunk(model, matrix: np.ndarray):
+    """(valid, predicted_cgpa, recommendation masks) for one chunk."""
+    valid = valid_rows(matrix)
+    predicted = np.zeros(len(matrix))
+    masks = np.zeros(len(matrix), dtype=np.uint16)
+    if valid.any():
+        predicted[valid], masks[valid] = score_matrix(model, matrix[valid])
+    return valid, predicted, masks
+
+
+_id_fragments = {}
+
+
+def _ids_json(mask: int) -> str:
+    # At most 2**9 distinct masks, so each JSON fragment is built once
+    fragment = _id_fragments.get(mask)
+    if fragment is None:
+        fragment = _id_fragments[mask] = json.dumps(ids_from_mask(mask))
+    return fragment
+
+
+def format_chunk(first_row: int, valid, predicted, masks, output_format: str) -> bytes:
+    lines = []
+    for offset, (ok, cgpa, mask) in enumerate(zip(valid.tolist(), predicted.tolist(), masks.tolist())):
+        row = first_row + offset
+        if output_format == "csv":
+            if ok:
+                lines.append(f"{row},{cgpa!r},{' '.join(map(str, ids_from_mask(mask)))},")
+            else:
+                lines.append(f"{row},,,{INVALID_ROW}")
+        elif ok:
+            lines.append(f'{{"row": {row}, "predicted_cgpa": {cgpa!r}, "recommendation_ids": {_ids_json(mask)}}}')
+        else:
+            lines.append(f'{{"row": {row}, "error": "{INVALID_ROW}"}}')
+    return ("\n".join(lines) + "\n").encode() if lines else b""
+
+
+def format_error(message: str, output_format: str) -> bytes:
+    if output_format == "csv":
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow(["", "", "", message])
+        return line.getvalue().encode()
+    return (json.dumps({"error": message}) + "\n").encode()
+
+
+def stream_scores(fp, input_format: str, output_format: str, model, chunk_rows: int = CHUNK_ROWS):
+    """Yield encoded output, one piece per scored chunk."""
+    if output_format == "csv":
+        yield b"row,predicted_cgpa,recommendation_ids,error\n"
+    first_row = 0
+    for matrix in READERS[input_format](fp, chunk_rows):
+        valid, predicted, masks = score_chunk(model, matrix)
+        yield format_chunk(first_row, valid, predicted, masks, output_format)
+        first_row += len(matrix)
+
+
+# ---------- HTTP: raw ASGI so the upload and the response can overlap ----------
+
+class _BodyPipe(io.RawIOBase):
+    """Blocking file-like fed with request body chunks from the event loop."""
+
+    def __init__(self, max_chunks: int = 16):
+        self._chunks = queue.Queue(max_chunks)
+        self._pending = b""
+        self._eof = False
+        self._finished = False
+        self.closed_by_reader = False
+
+    def readable(self):
+        return True
+
+    def feed(self, data: bytes):
+        while not self.closed_by_reader:
+            try:
+                self._chunks.put(data, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readinto(self, buffer):
+        while not self._pending and not self._eof:
+            # Read the flag before waiting: finish() comes after the last feed(),
+            # so if it was already set, an empty wait means nothing is left. Read
+            # after the wait, a last chunk fed meanwhile would be dropped
+            finished = self._finished
+            try:
+                self._pending = self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                self._eof = finished and self._chunks.empty()
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def finish(self):
+        self._finished = True
+
+
+class _Spool:
+    """Scored output on its way to the client.
+
+    The producer thread appends without ever waiting for the client, so a
+    client that uploads the whole body before reading the response can't stall
+    the body reader. Output beyond max_memory spills to a temporary file.
+    """
+
+    def __init__(self, loop, max_memory: int = 8 * 1024 * 1024):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._lock = threading.Lock()
+        self._written = 0
+        self._read = 0
+        self._done = False
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def write(self, data: bytes):
+        with self._lock:
+            self._file.seek(self._written)
+            self._file.write(data)
+            self._written += len(data)
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def close_writer(self):
+        with self._lock:
+            self._done = True
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def read(self, size: int = 256 * 1024):
+        """Next piece of output, or None once everything has been read."""
+        while True:
+            self._ready.clear()
+            with self._lock:
+                if self._read < self._written:
+                    self._file.seek(self._read)
+                    data = self._file.read(min(size, self._written - self._read))
+                    self._read += len(data)
+                    return data
+                if self._done:
+                    return None
+            await self._ready.wait()
+
+    def close(self):
+        self._file.close()
+
+
+class BulkScoringApp:
+    """POST /predict/bulk?format=csv|ndjson|arrow&output=ndjson|csv
+
+    The input format defaults from Content-Type. Starlette's StreamingResponse
+    watches receive() for disconnects itself, which would swallow body
+    chunks, so this endpoint speaks ASGI directly.
+    """
+
+    def __init__(self, get_model, chunk_rows: int = CHUNK_ROWS):
+        self.get_model = get_model
+        self.chunk_rows = chunk_rows
+
+    async def __call__(self, scope, receive, send):
+        from starlette.datastructures import Headers, QueryParams
+        from starlette.responses import JSONResponse
+
+        headers = Headers(scope=scope)
+        params = QueryParams(scope["query_string"])
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        input_format = params.get("format") or CONTENT_TYPES.get(content_type, "csv")
+        output_format = params.get("output", "ndjson")
+        if input_format not in INPUT_FORMATS or output_format not in OUTPUT_FORMATS:
+            response = JSONResponse(
+                {"detail": f"format must be one of {INPUT_FORMATS}, output one of {OUTPUT_FORMATS}"},
+                status_code=415,
+            )
+            await response(scope, receive, send)
+            return
+        if input_format == "arrow" and not HAVE_ARROW:
+            await JSONResponse({"detail": "Arrow input needs pyarrow installed"}, status_code=501)(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        model = self.get_model()
+        pipe = _BodyPipe()
+        spool = _Spool(loop)
+
+        def produce():
+            try:
+                reader = io.BufferedReader(pipe)
+                for piece in stream_scores(reader, input_format, output_format, model, self.chunk_rows):
+                    spool.write(piece)
+            except Exception as e:
+                spool.write(format_error(str(e), output_format))
+            finally:
+                pipe.closed_by_reader = True
+                spool.close_writer()
+
+        async def consume_body():
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    break
+                more_body = message.get("more_body", False)
+                if message.get("body"):
+                    await loop.run_in_executor(None, pipe.feed, message["body"])
+            pipe.finish()
+
+        producer = loop.run_in_executor(None, produce)
+        body_task = asyncio.ensure_future(consume_body())
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", MEDIA_TYPES[output_format].encode())],
+        })
+        try:
+            while (piece := await spool.read()) is not None:
+                await send({"type": "http.response.body", "body": piece, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            # On a disconnect, let the producer run out of input and stop
+            body_task.cancel()
+            pipe.closed_by_reader = True
+            pipe.finish()
+            await producer
+            spool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a cohort file with the CGPA model")
+    parser.add_argument("input", help="CSV, NDJSON or Arrow IPC stream file; '-' for stdin")
+    parser.add_argument("--format", "-f", choices=INPUT_FORMATS, help="input format (default: from the file extension)")
+    parser.add_argument("--output", "-o", default="-", help="output file; '-' for stdout")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="ndjson")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    input_format = args.format or EXTENSIONS.get(os.path.splitext(args.input)[1].lower())
+    if input_format is None:
+        parser.error("cannot tell the input format from the file name, pass --format")
+
+    from main import get_model
+
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    sink = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    with source, sink:
+        for piece in stream_scores(source, input_format, args.output_format, get_model(), args.chunk_rows):
+            sink.write(piece)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Precomputed CGPA distributions per student cohort, for percentile ranks.
+
+A cohort is a program, year of study and living situation, where any of the
+three can be left open ("BBIS 4th year" is every BBIS 4th-year student,
+whatever their living situation). The offline build takes the cleaned survey
+(see survey.py) and stores every cohort's CGPAs sorted, as int16 centi-points,
+in one concatenated array with an offset per cohort (cohorts.npz). Serving a
+rank is then a dict lookup and two binary searches on that cohort's slice.
+
+New responses are merged in without the old survey file: update() hashes the
+new rows, skips ones already counted and merges each affected cohort's new
+values into its sorted array.
+
+    python cohorts.py build responses.csv          # writes cohorts.npz
+    python cohorts.py update new_responses.csv     # merges into cohorts.npz
+
+Only build, update and the CLI need pandas and survey.py; loading and ranking
+use survey_keys.py, so the API process doesn't import pandas for /percentile.
+"""
+import argparse
+from itertools import product
+
+import numpy as np
+
+from survey_keys import CGPA, LIVING, PROGRAM, YEAR, column_key
+
+DIMENSIONS = (PROGRAM, YEAR, LIVING)
+ANY = "*"
+SEPARATOR = "\x1f"
+# Smaller cohorts are kept for later merges but not ranked against:
+# a rank among a handful of students says little
+MIN_COHORT = 5
+
+
+def _cohort_values(df):
+    """Per dimension (key code per row, key names, labels), and centi CGPA, for usable rows."""
+    import pandas as pd
+
+    cgpa = pd.to_numeric(df[CGPA], errors="coerce").to_numpy(dtype=float)
+    usable = (cgpa >= 0) & (cgpa <= 4)
+    dimensions = []
+    for column in DIMENSIONS:
+        categories = list(df[column].cat.categories)
+        names, category_key = np.unique([column_key(column)(label) for label in categories], return_inverse=True)
+        labels = [categories[np.flatnonzero(category_key == i)[0]] for i in range(len(names))]
+        codes = df[column].cat.codes.to_numpy()[usable]
+        # Missing answers keep code -1 and only count towards ANY
+        dimensions.append((np.where(codes >= 0, category_key[codes], -1), names.tolist(), labels))
+    return dimensions, np.rint(cgpa[usable] * 100).astype(np.int16)
+
+
+def _group(dimensions, centi: np.ndarray) -> dict:
+    """{cohort key: (label, sorted centi CGPAs)} for every combination of open dimensions."""
+    cohorts = {}
+    for open_dims in product((False, True), repeat=len(DIMENSIONS)):
+        fixed = [i for i, is_open in enumerate(open_dims) if not is_open]
+        codes = np.column_stack([dimensions[i][0] for i in fixed] or [np.zeros(len(centi), dtype=int)])
+        complete = (codes >= 0).all(axis=1)
+        codes, values = codes[complete], centi[complete]
+        # Sort by cohort, then CGPA; each cohort is then one sorted run
+        order = np.lexsort((values, *codes.T[::-1]))
+        codes, values = codes[order], values[order]
+        starts = np.concatenate([[0], np.flatnonzero((codes[1:] != codes[:-1]).any(axis=1)) + 1])
+        for start, end in zip(starts, np.append(starts[1:], len(values))):
+            if start == end:
+                continue
+            parts, label = [], []
+            for i, is_open in enumerate(open_dims):
+                if is_open:
+                    parts.append(ANY)
+                else:
+                    code = codes[start, fixed.index(i)]
+                    parts.append(dimensions[i][1][code])
+                    label.append(dimensions[i][2][code])
+            cohorts[SEPARATOR.join(parts)] = (" / ".join(label) or "all students", values[start:end])
+    return cohorts
+
+
+class CohortRollups:
+    def __init__(self, cohorts: dict, hashes: np.ndarray = None):
+        """cohorts: {cohort key: (label, sorted int16 centi CGPAs)}, including small ones."""
+        self.cohorts = cohorts
+        self.hashes = np.sort(hashes) if hashes is not None else None
+        # Serving index over the cohorts big enough to rank against
+        self._index = {
+            key: (label, values) for key, (label, values) in cohorts.items() if len(values) >= MIN_COHORT
+        }
+
+    # ---------- offline build ----------
+
+    @classmethod
+    def build(cls, df):
+        """From a survey frame as cleaned by survey.clean_survey."""
+        from survey import row_hashes
+
+        return cls(_group(*_cohort_values(df)), row_hashes(df))
+
+    def update(self, df):
+        """New rollups with a cleaned batch merged in; rows seen before are skipped."""
+        from survey import row_hashes
+
+        hashes = row_hashes(df)
+        new = ~np.isin(hashes, self.hashes)
+        if not new.any():
+            return self, 0
+        cohorts = dict(self.cohorts)
+        for key, (label, values) in _group(*_cohort_values(df[new])).items():
+            if key in cohorts:
+                label, old = cohorts[key]
+                # Both sides are sorted: insert positions keep the merge linear
+                values = np.insert(old, np.searchsorted(old, values), values)
+            cohorts[key] = (label, values)
+        return CohortRollups(cohorts, np.concatenate([self.hashes, hashes[new]])), int(new.sum())
+
+    # ---------- storage ----------
+
+    def save(self, path: str):
+        keys = sorted(self.cohorts)
+        arrays = [self.cohorts[key][1] for key in keys]
+        np.savez_compressed(
+            path,
+            keys=np.array(keys, dtype=str),
+            labels=np.array([self.cohorts[key][0] for key in keys], dtype=str),
+            offsets=np.cumsum([0] + [len(values) for values in arrays]),
+            centi=np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int16),
+            hashes=self.hashes,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            offsets, centi = data["offsets"], data["centi"]
+            cohorts = {
+                key: (label, centi[start:end])
+                for key, label, start, end in zip(data["keys"].tolist(), data["labels"].tolist(), offsets[:-1], offsets[1:])
+            }
+            return cls(cohorts, data["hashes"])
+
+    # ---------- serving ----------
+
+    def rank(self, cgpa: float, program=None, year=None, living=None):
+        """Where `cgpa` falls in a cohort, or None if it has fewer than MIN_COHORT students."""
+        key = SEPARATOR.join(
+            ANY if value is None else column_key(column)(value)
+            for column, value in zip(DIMENSIONS, (program, year, living))
+        )
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        label, values = entry
+        centi = round(cgpa * 100)
+        below = int(np.searchsorted(values, centi, "left"))
+        at_or_below = int(np.searchsorted(values, centi, "right"))
+        n = len(values)
+        return {
+            "cohort": label,
+            "n": n,
+            # Mid-rank: ties count half below, half above
+            "percentile": round(100 * (below + at_or_below) / (2 * n), 1),
+            "top_percent": round(100 * (n - below) / n, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the cohort CGPA rollups")
+    parser.add_argument("command", choices=("build", "update"))
+    parser.add_argument("input", help="survey responses CSV")
+    parser.add_argument("-o", "--output", default="cohorts.npz")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from survey import clean_survey
+
+    df = clean_survey(pd.read_csv(args.input))[0]
+    if args.command == "build":
+        rollups, added = CohortRollups.build(df), len(df)
+    else:
+        rollups, added = CohortRollups.load(args.output).update(df)
+    rollups.save(args.output)
+    print(f"✅ {added} new responses, {len(rollups.hashes)} total, "
+          f"{len(rollups._index)} cohorts with {MIN_COHORT}+ students -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Input drift monitoring for live /predict traffic.
+
+train_and_save_model.py saves a reference profile of the training inputs
+(reference_profile.json): a fixed-bin histogram plus mean and variance for
+each InputData field. At serving time DriftMonitor keeps the same statistics
+for the current time window and a few past ones. That is constant memory, and
+an observation is one bin increment plus two running sums per field. Each
+window is then compared with the reference:
+
+    psi         population stability index over the bins
+                (< 0.1 stable, 0.1-0.25 moderate shift, > 0.25 major shift)
+    ks          largest gap between the binned CDFs
+    mean_shift  (live mean - reference mean) / reference std
+
+Each worker process only sees the requests it serves. With start(store_path)
+every worker writes its windows to a shared SQLite file every few seconds
+and report() merges all workers' rows per window, so /drift covers the whole
+deployment whichever worker answers it.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import closing
+
+import numpy as np
+
+from scoring import FEATURES
+
+# (low, high, bins) per feature, in FEATURES order; values are clipped into range
+BINS = (
+    (0, 2, 2),     # repeated_course: 0 / 1
+    (0, 100, 10),  # attendance
+    (0, 2, 2),     # part_time_job: 0 / 1
+    (0, 11, 11),   # motivation_level: 0 .. 10
+    (0, 2, 2),     # first_generation: 0 / 1
+    (0, 11, 11),   # friends_performance: 0 .. 10
+)
+MAX_BINS = max(bins for _, _, bins in BINS)
+
+_LOW = np.array([low for low, _, _ in BINS], dtype=float)
+_WIDTH = np.array([(high - low) / bins for low, high, bins in BINS], dtype=float)
+_LAST_BIN = np.array([bins - 1 for _, _, bins in BINS])
+_OFFSETS = np.arange(len(FEATURES)) * MAX_BINS
+# Padding columns past a feature's own bins never get counts
+_VALID_BINS = np.arange(MAX_BINS)[None, :] <= _LAST_BIN[:, None]
+
+# The single-row path is plain Python: at six values numpy call overhead
+# would cost more than the arithmetic
+_SPECS = tuple(
+    (float(low), (high - low) / bins, bins - 1, i * MAX_BINS)
+    for i, (low, high, bins) in enumerate(BINS)
+)
+
+PSI_EPSILON = 1e-4
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drift_windows (
+    worker TEXT NOT NULL,
+    window_start REAL NOT NULL,
+    n INTEGER NOT NULL,
+    counts TEXT NOT NULL,
+    sums TEXT NOT NULL,
+    sum_squares TEXT NOT NULL,
+    PRIMARY KEY (worker, window_start)
+)
+"""
+
+
+def bin_indices(features: np.ndarray) -> np.ndarray:
+    """Bin index per value for a (rows x FEATURES) matrix."""
+    return np.clip(((features - _LOW) // _WIDTH).astype(int), 0, _LAST_BIN)
+
+
+class WindowStats:
+    def __init__(self, start: float):
+        self.start = start
+        self.n = 0
+        # Flat (FEATURES x MAX_BINS) counts and per-feature running sums
+        self.counts = [0] * (len(FEATURES) * MAX_BINS)
+        self.sums = [0.0] * len(FEATURES)
+        self.sum_squares = [0.0] * len(FEATURES)
+
+    def add(self, features: np.ndarray):
+        flat = (bin_indices(features) + _OFFSETS).ravel()
+        binned = np.bincount(flat, minlength=len(self.counts)).tolist()
+        self.counts = [a + b for a, b in zip(self.counts, binned)]
+        self.n += len(features)
+        self.sums = [a + b for a, b in zip(self.sums, features.sum(axis=0).tolist())]
+        self.sum_squares = [a + b for a, b in zip(self.sum_squares, (features ** 2).sum(axis=0).tolist())]
+
+    def add_one(self, row):
+        counts, sums, sum_squares = self.counts, self.sums, self.sum_squares
+        for i, (value, (low, width, last, offset)) in enumerate(zip(row, _SPECS)):
+            b = int((value - low) // width)
+            counts[offset + (0 if b < 0 else last if b > last else b)] += 1
+            sums[i] += value
+            sum_squares[i] += value * value
+        self.n += 1
+
+    def merge(self, n: int, counts, sums, sum_squares):
+        """Add another worker's statistics for the same window."""
+        self.n += n
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sums = [a + b for a, b in zip(self.sums, sums)]
+        self.sum_squares = [a + b for a, b in zip(self.sum_squares, sum_squares)]
+
+    def proportions(self) -> np.ndarray:
+        return np.array(self.counts, dtype=float).reshape(len(FEATURES), MAX_BINS) / max(self.n, 1)
+
+    def mean(self) -> np.ndarray:
+        return np.array(self.sums) / max(self.n, 1)
+
+    def variance(self) -> np.ndarray:
+        mean = self.mean()
+        return np.maximum(np.array(self.sum_squares) / max(self.n, 1) - mean * mean, 0.0)
+
+
+def build_reference(features) -> dict:
+    """Reference profile for a training matrix, as saved next to model.pkl."""
+    stats = WindowStats(time.time())
+    stats.add(np.asarray(features, dtype=float))
+    return {
+        "n": stats.n,
+        "bins": [list(spec) for spec in BINS],
+        "features": {
+            name: {
+                "proportions": stats.proportions()[i, :BINS[i][2]].tolist(),
+                "mean": float(stats.mean()[i]),
+                "variance": float(stats.variance()[i]),
+            }
+            for i, name in enumerate(FEATURES)
+        },
+    }
+
+
+class DriftMonitor:
+    def __init__(self, reference: dict, window_seconds: float = 3600, keep_windows: int = 24):
+        if [tuple(spec) for spec in reference["bins"]] != list(BINS):
+            raise ValueError("reference profile was built with different bins")
+        self.window_seconds = window_seconds
+        self.reference_n = reference["n"]
+        self.ref_proportions = np.zeros((len(FEATURES), MAX_BINS))
+        for i, name in enumerate(FEATURES):
+            profile = reference["features"][name]
+            self.ref_proportions[i, :len(profile["proportions"])] = profile["proportions"]
+        self.ref_mean = np.array([reference["features"][name]["mean"] for name in FEATURES])
+        self.ref_std = np.sqrt([reference["features"][name]["variance"] for name in FEATURES])
+        self.keep_windows = keep_windows
+        self.current = WindowStats(self._window_start(time.time()))
+        self.history = deque(maxlen=keep_windows)
+        self._lock = threading.Lock()
+        self.store_path = None
+        self._worker = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs):
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def _window_start(self, now: float) -> float:
+        return now - now % self.window_seconds
+
+    def _rotate(self, now: float):
+        if now >= self.current.start + self.window_seconds:
+            if self.current.n:
+                self.history.append(self.current)
+            self.current = WindowStats(self._window_start(now))
+
+    def observe(self, row):
+        with self._lock:
+            self._rotate(time.time())
+            self.current.add_one(row)
+
+    def observe_many(self, features: np.ndarray):
+        with self._lock:
+            self._rotate(time.time())
+            self.current.add(features)
+
+    # ---------- shared store ----------
+
+    def start(self, store_path: str, flush_interval: float = 5.0):
+        """Share this worker's windows through store_path; call once per worker process."""
+        with closing(self._connect(store_path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(STORE_SCHEMA)
+        with self._lock:
+            # Anything observed before a fork belongs to the parent, not this worker
+            self.current = WindowStats(self._window_start(time.time()))
+            self.history.clear()
+        self.store_path = store_path
+        self._worker = uuid.uuid4().hex
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(flush_interval,), name="drift-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.store_path is not None:
+            self.flush()
+
+    @staticmethod
+    def _connect(path: str):
+        return sqlite3.connect(path, timeout=30, isolation_level=None)
+
+    def _run(self, flush_interval: float):
+        while not self._stop.wait(flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # the next flush writes the same totals again
+
+    def _oldest_kept(self) -> float:
+        return self._window_start(time.time()) - self.keep_windows * self.window_seconds
+
+    def flush(self):
+        """Write this worker's windows (running totals, so rewriting is idempotent)."""
+        with self._lock:
+            self._rotate(time.time())
+            rows = [
+                (self._worker, stats.start, stats.n, json.dumps(stats.counts),
+                 json.dumps(stats.sums), json.dumps(stats.sum_squares))
+                for stats in (*self.history, self.current) if stats.n
+            ]
+        with closing(self._connect(self.store_path)) as conn, conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO drift_windows VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM drift_windows WHERE window_start < ?", (self._oldest_kept(),))
+
+    def _shared_windows(self) -> list:
+        self.flush()
+        windows = {}
+        with closing(self._connect(self.store_path)) as conn:
+            rows = conn.execute(
+                "SELECT window_start, n, counts, sums, sum_squares FROM drift_windows WHERE window_start >= ?",
+                (self._oldest_kept(),),
+            ).fetchall()
+        for start, n, counts, sums, sum_squares in rows:
+            stats = windows.setdefault(start, WindowStats(start))
+            stats.merge(n, json.loads(counts), json.loads(sums), json.loads(sum_squares))
+        return [windows[start] for start in sorted(windows)]
+
+    # ---------- scoring ----------
+
+    def score(self, stats: WindowStats) -> dict:
+        live = np.clip(stats.proportions(), PSI_EPSILON, None)
+        ref = np.clip(self.ref_proportions, PSI_EPSILON, None)
+        psi = np.where(_VALID_BINS, (live - ref) * np.log(live / ref), 0.0).sum(axis=1)
+        ks = np.abs(np.cumsum(stats.proportions(), axis=1) - np.cumsum(self.ref_proportions, axis=1)).max(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shift = np.where(self.ref_std > 0, (stats.mean() - self.ref_mean) / self.ref_std, 0.0)
+        return {
+            "window_start": stats.start,
+            "n": stats.n,
+            "features": {
+                name: {
+                    "psi": round(float(psi[i]), 4),
+                    "ks": round(float(ks[i]), 4),
+                    "mean": round(float(stats.mean()[i]), 4),
+                    "reference_mean": round(float(self.ref_mean[i]), 4),
+                    "mean_shift": round(float(shift[i]), 4),
+                }
+                for i, name in enumerate(FEATURES)
+            },
+        }
+
+    def report(self) -> dict:
+        if self.store_path is not None:
+            windows = self._shared_windows()
+        else:
+            with self._lock:
+                self._rotate(time.time())
+                windows = [*self.history, self.current]
+        scores = [self.score(stats) for stats in reversed(windows) if stats.n]
+        return {
+            "window_seconds": self.window_seconds,
+            "reference_n": self.reference_n,
+            "windows": scores,
+        }
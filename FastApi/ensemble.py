@@ -0,0 +1,57 @@
+"""Bootstrap ensemble of linear models for prediction intervals.
+
+train_and_save_model.py --bootstrap K fits K LinearRegressions on bootstrap
+resamples of the training data and saves their coefficients stacked into
+one (features x K) matrix (ensemble.npz). Serving then gets all K predictions
+for a batch from a single matrix multiply. It reports a percentile interval
+of the clipped predictions and the share of them at or above the 2.5 CGPA
+risk threshold.
+"""
+import numpy as np
+
+from scoring import CGPA_BANDS
+
+PASS_CGPA = min(threshold for threshold, _ in CGPA_BANDS)
+
+
+class LinearEnsemble:
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray):
+        # Stored as (features x K) so X @ coef is one contiguous GEMM
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.size = len(self.intercept)
+
+    @classmethod
+    def fit_bootstrap(cls, X, y, k: int, seed=None):
+        from sklearn.linear_model import LinearRegression
+
+        X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+        rng = np.random.default_rng(seed)
+        coefs, intercepts = [], []
+        for _ in range(k):
+            sample = rng.integers(0, len(X), len(X))
+            fitted = LinearRegression().fit(X[sample], y[sample])
+            coefs.append(fitted.coef_)
+            intercepts.append(fitted.intercept_)
+        return cls(np.array(coefs).T, np.array(intercepts))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(data["coef"], data["intercept"])
+
+    def save(self, path: str):
+        np.savez(path, coef=self.coef, intercept=self.intercept)
+
+    def predict_all(self, features: np.ndarray) -> np.ndarray:
+        """(rows x K) clipped predictions."""
+        return np.clip(features @ self.coef + self.intercept, 0.0, 4.0)
+
+    def summarize(self, features: np.ndarray, level: float = 0.9):
+        """(low, high, p_pass) per row for a central `level` interval."""
+        predictions = np.sort(self.predict_all(features), axis=1)
+        tail = (1 - level) / 2
+        low = predictions[:, int(np.floor(tail * (self.size - 1)))]
+        high = predictions[:, int(np.ceil((1 - tail) * (self.size - 1)))]
+        p_pass = (predictions >= PASS_CGPA).mean(axis=1)
+        return np.round(low, 2), np.round(high, 2), np.round(p_pass, 4)
@@ -0,0 +1,94 @@
+"""Per-feature contributions to a prediction.
+
+A contribution says how much one input moved the raw (unclipped) CGPA away
+from a baseline prediction; baseline + the sum of contributions is the raw
+prediction itself. Explainers are built once at model load and return the
+predictions and the contributions together, so ?explain=true costs a few
+array operations per row on top of scoring, not a second model pass.
+
+    linear models   coef * (value - baseline), with the training means from
+                    reference_profile.json as baseline (zeros without one)
+    tree models     path attribution: every split on the way to a leaf credits
+                    the change in node value to the split feature, and the
+                    baseline is the root value. Trees are flattened with
+                    forest.py and each node's accumulated credit precomputed,
+                    so a row costs one leaf lookup per tree.
+"""
+import json
+
+import numpy as np
+
+from forest import FlatForest
+from scoring import FEATURES
+
+
+def load_baseline(path: str):
+    """Training means per feature from a reference profile, or None."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except OSError:
+        return None
+    return np.array([profile["features"][name]["mean"] for name in FEATURES])
+
+
+class LinearExplainer:
+    def __init__(self, model, baseline=None):
+        self.coef = np.asarray(model.coef_, dtype=float).ravel()
+        self.intercept = float(np.ravel(model.intercept_)[0])
+        self.baseline = np.zeros(len(self.coef)) if baseline is None else np.asarray(baseline, dtype=float)
+        self.base_value = self.intercept + float(self.coef @ self.baseline)
+
+    def explain(self, features: np.ndarray):
+        """(raw predictions, (rows x FEATURES) contributions)."""
+        # Same arithmetic as LinearRegression.predict, so predictions match it exactly
+        return features @ self.coef + self.intercept, (features - self.baseline) * self.coef
+
+
+def _node_credit(forest: FlatForest) -> np.ndarray:
+    """(nodes x FEATURES) credit accumulated from its tree's root to every node."""
+    credit = np.zeros((len(forest.value), len(FEATURES)))
+    parents = forest.roots
+    while len(parents):
+        parents = parents[forest.left[parents] != parents]  # leaves point at themselves
+        for children in (forest.left[parents], forest.right[parents]):
+            credit[children] = credit[parents]
+            credit[children, forest.feature[parents]] += forest.value[children] - forest.value[parents]
+        parents = np.concatenate([forest.left[parents], forest.right[parents]])
+    return credit
+
+
+class TreeExplainer:
+    """Any model FlatForest can flatten, or a FlatForest itself."""
+
+    def __init__(self, model):
+        self.forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+        self.credit = _node_credit(self.forest)
+        self.base_value = self.forest.init + self.forest.scale * float(self.forest.value[self.forest.roots].sum())
+
+    def explain(self, features: np.ndarray):
+        forest = self.forest
+        leaves = forest.apply(features)
+        raw = forest.init + forest.scale * forest.value[leaves].sum(axis=1)
+        return raw, forest.scale * self.credit[leaves].sum(axis=1)
+
+
+def make_explainer(model, baseline=None):
+    """Explainer for a fitted model, or None for model types without one."""
+    if hasattr(model, "coef_"):
+        return LinearExplainer(model, baseline)
+    try:
+        return TreeExplainer(model)
+    except TypeError:
+        return None
+
+
+def contribution_fields(explainer, contributions: np.ndarray, single: bool) -> dict:
+    """Response fields for ?explain=true."""
+    columns = np.round(contributions, 4).T.tolist()
+    return {
+        "baseline_cgpa": round(explainer.base_value, 4),
+        "contributions": {
+            name: column[0] if single else column for name, column in zip(FEATURES, columns)
+        },
+    }
@@ -0,0 +1,150 @@
+"""Flattened tree-ensemble inference.
+
+FlatForest.from_sklearn exports a fitted regression tree ensemble into a few
+contiguous arrays over all nodes of all trees: split feature, threshold,
+left / right child and node value. Leaves point back at themselves. Scoring
+walks every tree for every row at once, one level per step:
+
+    node = root of each tree                         (rows x trees)
+    repeat max_depth times:
+        node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+    prediction = init + scale * sum of value[node]
+
+That is max_depth vectorized steps per call, without sklearn's per-call
+input validation and per-tree dispatch, which dominate a one-row /predict
+call. A FlatForest has predict() like the sklearn model it
+came from, so train_and_save_model.py --model gbr pickles one as model.pkl
+and the service loads it like any other model.
+
+Supported: DecisionTreeRegressor, RandomForestRegressor, ExtraTreesRegressor,
+GradientBoostingRegressor and HistGradientBoostingRegressor without
+categorical features or a log-link loss (poisson, gamma). Inputs must not
+contain NaN (the API never sends it).
+"""
+import numpy as np
+
+# (row, tree) pairs walked together; keeps the node arrays cache-sized on big batches
+BLOCK_SIZE = 65536
+IDENTITY_LINK_LOSSES = ("squared_error", "absolute_error", "quantile")
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, init: float, scale: float,
+                 max_depth: int, float32_inputs: bool):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        # Interleaved (left, right) pairs: a step is one gather at 2 * node + went_right
+        self.children = np.stack([self.left, self.right], axis=1).ravel()
+        self.init = float(init)
+        self.scale = float(scale)
+        self.max_depth = int(max_depth)
+        # sklearn's own trees compare float32 copies of the inputs; HistGradientBoosting uses float64
+        self.float32_inputs = bool(float32_inputs)
+
+    # ---------- export ----------
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """TypeError for anything but the supported regressors listed above."""
+        from sklearn.ensemble import (
+            ExtraTreesRegressor,
+            GradientBoostingRegressor,
+            HistGradientBoostingRegressor,
+            RandomForestRegressor,
+        )
+
+        if isinstance(model, HistGradientBoostingRegressor):
+            return cls._from_hist_gradient_boosting(model)
+        if hasattr(model, "tree_"):
+            trees, init, scale = [model], 0.0, 1.0
+        elif isinstance(model, GradientBoostingRegressor):
+            trees, scale = list(np.ravel(model.estimators_)), model.learning_rate
+            init = 0.0 if model.init_ == "zero" else float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+        elif isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+            trees, init = list(model.estimators_), 0.0
+            scale = 1.0 / len(trees)
+        else:
+            # Other ensembles (bagging, voting, AdaBoost) don't sum or average their trees
+            raise TypeError(f"cannot flatten a {type(model).__name__}")
+        # One regression output per node, or it's a classifier / multi-output model
+        if not all(hasattr(estimator, "tree_") and estimator.tree_.value.shape[1:] == (1, 1) for estimator in trees):
+            raise TypeError(f"cannot flatten a {type(model).__name__}: not single-output regression trees")
+
+        parts, offset = [], 0
+        for estimator in trees:
+            tree = estimator.tree_
+            ids = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            parts.append((
+                np.where(leaf, 0, tree.feature),
+                np.where(leaf, np.inf, tree.threshold),
+                np.where(leaf, ids, tree.children_left) + offset,
+                np.where(leaf, ids, tree.children_right) + offset,
+                tree.value[:, 0, 0],
+                offset,
+                tree.max_depth,
+            ))
+            offset += tree.node_count
+        return cls._concatenate(parts, init, scale, float32_inputs=True)
+
+    @classmethod
+    def _from_hist_gradient_boosting(cls, model):
+        if getattr(model, "is_categorical_", None) is not None and model.is_categorical_.any():
+            raise TypeError("categorical HistGradientBoosting splits are not supported")
+        # poisson and gamma sum the trees on a log scale; only identity-link losses sum to the prediction
+        if model.loss not in IDENTITY_LINK_LOSSES:
+            raise TypeError(f"HistGradientBoosting with loss={model.loss!r} is not supported")
+        parts, offset = [], 0
+        for (predictor,) in model._predictors:
+            nodes = predictor.nodes
+            ids = np.arange(len(nodes))
+            leaf = nodes["is_leaf"].astype(bool)
+            parts.append((
+                np.where(leaf, 0, nodes["feature_idx"]),
+                np.where(leaf, np.inf, nodes["num_threshold"]),
+                np.where(leaf, ids, nodes["left"]) + offset,
+                np.where(leaf, ids, nodes["right"]) + offset,
+                nodes["value"],
+                offset,
+                int(nodes["depth"].max()),
+            ))
+            offset += len(nodes)
+        # Leaf values already include the learning rate
+        init = float(np.ravel(model._baseline_prediction)[0])
+        return cls._concatenate(parts, init, 1.0, float32_inputs=False)
+
+    @classmethod
+    def _concatenate(cls, parts, init, scale, float32_inputs):
+        feature, threshold, left, right, value, roots, depths = zip(*parts)
+        return cls(
+            np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+            np.concatenate(right), np.concatenate(value), np.array(roots),
+            init=init, scale=scale, max_depth=max(depths), float32_inputs=float32_inputs,
+        )
+
+    # ---------- inference ----------
+
+    def apply(self, features) -> np.ndarray:
+        """(rows x trees) leaf node ids, indexing the flattened arrays."""
+        features = np.asarray(features, dtype=np.float32 if self.float32_inputs else np.float64)
+        flat = features.astype(np.float64).ravel()
+        leaves = np.empty((len(features), len(self.roots)), dtype=np.intp)
+        block_rows = max(1, BLOCK_SIZE // len(self.roots))
+        for start in range(0, len(features), block_rows):
+            rows = min(block_rows, len(features) - start)
+            # Position of each row's first value in `flat`
+            row_start = ((start + np.arange(rows, dtype=np.intp)) * features.shape[1])[:, None]
+            nodes = np.broadcast_to(self.roots, (rows, len(self.roots)))
+            for _ in range(self.max_depth):
+                go_right = np.take(flat, row_start + np.take(self.feature, nodes)) > np.take(self.threshold, nodes)
+                nodes = np.take(self.children, 2 * nodes + go_right)
+            leaves[start:start + rows] = nodes
+        return leaves
+
+    def predict(self, features) -> np.ndarray:
+        return self.init + self.scale * self.value[self.apply(features)].sum(axis=1)
+
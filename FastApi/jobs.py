@@ -0,0 +1,375 @@
+"""Background jobs for work that outlives an HTTP request.
+
+Bulk scoring of large cohort files and cohort-wide simulations run in a
+process pool, so they never compete with /predict for the event loop or the
+request thread pool. Job state lives in a small SQLite database and inputs and
+results are plain files, all under MARGADARSHAK_JOB_DIR (default ./jobs).
+Workers record progress after every chunk and check for a cancel request
+between chunks. A job's input file is removed once it finishes, and finished
+jobs and their results are purged after MARGADARSHAK_JOB_RETENTION seconds
+(default a week).
+
+States: queued -> running -> done | failed | cancelled
+
+Each API process gets a boot id at init_store and holds a lock file for it
+until it exits. Jobs record the boot id that submitted them, so a later
+init_store can tell orphaned jobs (lock free: the owner is gone) from ones a
+sibling worker is still running, even if the owner's PID has been reused.
+A process only ever removes its own lock file, on shutdown; a crashed one
+leaves an empty file behind. POSIX only (fcntl), like serve.py.
+"""
+import fcntl
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_DIR = os.environ.get("MARGADARSHAK_JOB_DIR", os.path.join(BASE_DIR, "jobs"))
+JOB_WORKERS = int(os.environ.get("MARGADARSHAK_JOB_WORKERS", 1))
+# Largest upload /jobs/bulk accepts
+MAX_INPUT_BYTES = int(os.environ.get("MARGADARSHAK_JOB_MAX_BYTES", 2 * 1024**3))
+RETENTION_SECONDS = float(os.environ.get("MARGADARSHAK_JOB_RETENTION", 7 * 24 * 3600))
+MODEL_PATH = os.path.join(BASE_DIR, "model.pkl")
+SIMULATION_CHUNK = 20
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---------- job store ----------
+
+def db_path() -> str:
+    return os.path.join(JOB_DIR, "jobs.sqlite3")
+
+
+def connect():
+    conn = sqlite3.connect(db_path(), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return closing(conn)
+
+
+BOOT_ID = None
+_boot_lock = None
+
+
+def _owner_lock_path(boot_id: str) -> str:
+    return os.path.join(JOB_DIR, f"owner-{boot_id}.lock")
+
+
+def _alive(boot_id: str) -> bool:
+    """Whether the process that booted as `boot_id` still holds its lock."""
+    try:
+        fd = os.open(_owner_lock_path(boot_id), os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    # The kernel dropped the lock when the owner exited, however it exited.
+    # The file stays: only its owner ever removes it
+    return False
+
+
+# PRAGMA user_version of the jobs table; version 1 recorded owners by PID
+SCHEMA_VERSION = 2
+
+_CREATE_JOBS = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        params TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        owner TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+"""
+
+
+def _migrate(conn):
+    """Create the jobs table or bring an older one up to SCHEMA_VERSION."""
+    # IMMEDIATE: prefork workers starting together migrate one at a time
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"job store schema {version} is newer than this code ({SCHEMA_VERSION})")
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "owner_pid" in columns:
+            # A PID can't be checked for liveness reliably; version 1 owners get an
+            # empty boot id, which no process holds a lock for, so the sweep below
+            # fails their unfinished jobs
+            conn.execute("ALTER TABLE jobs RENAME TO jobs_v1")
+            conn.execute(_CREATE_JOBS)
+            conn.execute("""
+                INSERT INTO jobs
+                SELECT id, kind, status, params, done, total, error, cancel_requested, '',
+                       created_at, started_at, finished_at
+                FROM jobs_v1
+            """)
+            conn.execute("DROP TABLE jobs_v1")
+        else:
+            conn.execute(_CREATE_JOBS)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def init_store():
+    global BOOT_ID, _boot_lock
+    os.makedirs(JOB_DIR, exist_ok=True)
+    BOOT_ID = uuid.uuid4().hex
+    # Locked before it appears under its real name, so a sibling's sweep
+    # can never find it unlocked
+    pending = os.path.join(JOB_DIR, f".owner-{BOOT_ID}.pending")
+    _boot_lock = open(pending, "w")
+    fcntl.flock(_boot_lock, fcntl.LOCK_EX)
+    os.rename(pending, _owner_lock_path(BOOT_ID))
+    try:
+        with connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _migrate(conn)
+            # Jobs whose submitting process has died will never finish
+            owners = {row["owner"] for row in conn.execute("SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')")}
+            stale = [owner for owner in owners - {BOOT_ID} if not _alive(owner)]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted by a restart', finished_at = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                [(time.time(), owner) for owner in stale],
+            )
+        purge_expired()
+    except BaseException:
+        # Leave no half-registered owner behind; ready() stays False
+        _boot_lock.close()
+        os.remove(_owner_lock_path(BOOT_ID))
+        BOOT_ID = _boot_lock = None
+        raise
+
+
+def ready() -> bool:
+    """Whether init_store succeeded in this process."""
+    return BOOT_ID is not None
+
+
+def input_path(job_id: str) -> str:
+    return os.path.join(JOB_DIR, f"{job_id}.input")
+
+
+def result_path(job_id: str) -> str:
+    return os.path.join(JOB_DIR, f"{job_id}.result")
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired():
+    """Delete finished jobs older than RETENTION_SECONDS, with their files."""
+    with connect() as conn:
+        expired = [
+            row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+                (time.time() - RETENTION_SECONDS,),
+            )
+        ]
+        for job_id in expired:
+            _remove(input_path(job_id))
+            _remove(result_path(job_id))
+        conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+
+
+def create_job(job_id: str, kind: str, params: dict, total=None):
+    with connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, params, total, owner, created_at) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params), total, BOOT_ID, time.time()),
+        )
+    purge_expired()
+
+
+def get_job(job_id: str):
+    with connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    del job["owner"]
+    job["params"] = json.loads(job["params"])
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def _update(job_id: str, **fields):
+    """Update a job that hasn't finished; a finished job's outcome is final."""
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with connect() as conn:
+        conn.execute(
+            f"UPDATE jobs SET {columns} WHERE id = ? AND status IN ('queued', 'running')",
+            (*fields.values(), job_id),
+        )
+
+
+def request_cancel(job_id: str):
+    with connect() as conn:
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+    future = _futures.get(job_id)
+    if future is not None and future.cancel():
+        _update(job_id, status="cancelled", finished_at=time.time())
+        _remove(input_path(job_id))
+
+
+# ---------- worker side (runs in the process pool) ----------
+
+def _progress(job_id: str, done: int):
+    """Record progress; raises JobCancelled if a cancel was requested or the job was failed meanwhile."""
+    with connect() as conn:
+        conn.execute("UPDATE jobs SET done = ? WHERE id = ?", (done, job_id))
+        cancelled, status = conn.execute("SELECT cancel_requested, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if cancelled or status in FINISHED:
+        raise JobCancelled()
+
+
+_model = None
+
+
+def _load_model():
+    """model.pkl, once per pool process; importing main here would build the whole API."""
+    global _model
+    if _model is None:
+        import cloudpickle
+
+        with open(MODEL_PATH, "rb") as f:
+            _model = cloudpickle.load(f)
+    return _model
+
+
+def _run(job_id: str, work):
+    _update(job_id, status="running", started_at=time.time())
+    try:
+        _progress(job_id, 0)
+        work()
+    except JobCancelled:
+        _update(job_id, status="cancelled", finished_at=time.time())
+        _remove(result_path(job_id))
+    except Exception as e:
+        _update(job_id, status="failed", error=str(e), finished_at=time.time())
+        _remove(result_path(job_id))
+    else:
+        _update(job_id, status="done", finished_at=time.time())
+    finally:
+        _remove(input_path(job_id))
+
+
+def run_bulk_job(job_id: str, input_format: str, output_format: str):
+    def work():
+        from bulk import stream_scores
+
+        model = _load_model()
+        lines = 0
+        header = 1 if output_format == "csv" else 0
+        with open(input_path(job_id), "rb") as source, open(result_path(job_id), "wb") as sink:
+            for piece in stream_scores(source, input_format, output_format, model):
+                sink.write(piece)
+                lines += piece.count(b"\n")
+                _progress(job_id, lines - header)
+    _run(job_id, work)
+
+
+def run_simulation_job(job_id: str):
+    def work():
+        from simulation import base_score, simulate_graduation
+
+        with open(input_path(job_id)) as f:
+            students = json.load(f)
+        with open(result_path(job_id), "w") as sink:
+            for start in range(0, len(students), SIMULATION_CHUNK):
+                lines = []
+                for offset, student in enumerate(students[start:start + SIMULATION_CHUNK]):
+                    settings = {key: student.pop(key) for key in ("method", "target_width", "max_draws", "seed")}
+                    result = simulate_graduation(base_score(**student), **settings)
+                    lines.append(json.dumps({"row": start + offset, **result}))
+                sink.write("\n".join(lines) + "\n")
+                _progress(job_id, start + len(lines))
+    _run(job_id, work)
+
+
+# ---------- submitting ----------
+
+_executor = None
+_futures = {}
+
+
+def _new_executor() -> ProcessPoolExecutor:
+    # spawn rather than fork: the API process is multi-threaded by then
+    return ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _finished(job_id: str, future):
+    _futures.pop(job_id, None)
+    # _run records its own outcome; this only catches a worker that died outright
+    if not future.cancelled() and future.exception() is not None:
+        _update(job_id, status="failed", error=f"worker crashed: {future.exception()}", finished_at=time.time())
+
+
+def submit(job_id: str, fn, *args):
+    global _executor
+    if _executor is None:
+        _executor = _new_executor()
+    try:
+        future = _executor.submit(fn, job_id, *args)
+    except BrokenProcessPool:
+        _executor = _new_executor()
+        future = _executor.submit(fn, job_id, *args)
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _finished(job_id, f))
+    return future
+
+
+def shutdown():
+    global _executor, _boot_lock
+    if BOOT_ID is not None:
+        with connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted by a shutdown', finished_at = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), BOOT_ID),
+            )
+    if _executor is not None:
+        # Executor.shutdown never stops a job that is already running, and its
+        # worker would outlive the service; stop the pool processes with it
+        for process in list(_executor._processes.values()):
+            process.terminate()
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+    _futures.clear()
+    if _boot_lock is not None:
+        _boot_lock.close()
+        os.remove(_owner_lock_path(BOOT_ID))
+        _boot_lock = None
@@ -0,0 +1,49 @@
+"""Precomputed predictions over the calculator's slider grid.
+
+The frontend only ever sends 0/1 flags and whole-number slider positions
+(attendance 0-100, motivation and friends 0-10), so there are just
+2 x 101 x 2 x 11 x 2 x 11 = 97,768 distinct inputs. PredictionTable scores all
+of them in one vectorized model call and keeps the clipped CGPA (as int16
+centi-points) and the recommendation bitmask (uint16), about 400 KB in total.
+Serving an on-grid request is then a single array index; anything off the
+grid returns None and goes through the model as before.
+"""
+import numpy as np
+
+from scoring import FEATURES, recommendation_masks
+
+# Inclusive integer range per feature, in FEATURES order
+GRID = (
+    (0, 1),    # repeated_course
+    (0, 100),  # attendance
+    (0, 1),    # part_time_job
+    (0, 10),   # motivation_level
+    (0, 1),    # first_generation
+    (0, 10),   # friends_performance
+)
+
+
+class PredictionTable:
+    def __init__(self, model):
+        axes = [np.arange(low, high + 1, dtype=float) for low, high in GRID]
+        self.shape = tuple(len(axis) for axis in axes)
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(FEATURES))
+
+        centi = np.rint(np.clip(model.predict(grid), 0.0, 4.0) * 100).astype(np.int16)
+        self.centi_cgpa = centi.reshape(self.shape)
+        self.masks = recommendation_masks(grid, centi / 100).reshape(self.shape)
+
+    def lookup(self, row):
+        """(predicted_cgpa, recommendation mask) for an on-grid row, else None."""
+        index = []
+        for value, (low, high) in zip(row, GRID):
+            position = int(value)
+            if position != value or not low <= position <= high:
+                return None
+            index.append(position - low)
+        index = tuple(index)
+        return int(self.centi_cgpa[index]) / 100, int(self.masks[index])
+
+    @property
+    def nbytes(self) -> int:
+        return self.centi_cgpa.nbytes + self.masks.nbytes
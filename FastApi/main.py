@@ -1,22 +1,157 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 import numpy as np
+import hashlib
+import json
 import os
-import cloudpickle
+import threading
+import time
+
+import jobs
+import profiling
+from bulk import CONTENT_TYPES, INPUT_FORMATS, MEDIA_TYPES, OUTPUT_FORMATS, BulkScoringApp
+from cohorts import CohortRollups
+from drift import DriftMonitor
+from ensemble import LinearEnsemble
+from explain import contribution_fields, load_baseline, make_explainer
+from lookup import PredictionTable
+from predlog import PredictionLog
+from scoring import (
+    FEATURES,
+    clip_prediction,
+    feature_row,
+    mask_from_ids,
+    recommendation_ids,
+    score_matrix,
+    score_predictions,
+)
+from simulation import base_score, simulate_graduation
+from whatif import what_if
+from serialization import (
+    FastJSONResponse,
+    PreEncodedJSONResponse,
+    batch_prediction_json,
+    prediction_json,
+)
 
-# Load model using cloudpickle
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(BASE_DIR, "model.pkl")
+# Bootstrap ensemble for ?intervals=true, from train_and_save_model.py --bootstrap K
+ensemble_path = os.path.join(BASE_DIR, "ensemble.npz")
+
+# With MARGADARSHAK_LAZY_MODEL=1 importing this module stays cheap and the
+# model is loaded during app startup instead (serve.py loads it in the parent)
+LAZY_MODEL = os.environ.get("MARGADARSHAK_LAZY_MODEL") == "1"
+
+# With MARGADARSHAK_LOOKUP_TABLE=1 every on-grid input is scored once at model
+# load and served from a precomputed table (see lookup.py)
+USE_LOOKUP_TABLE = os.environ.get("MARGADARSHAK_LOOKUP_TABLE") == "1"
+
+# Every prediction is appended to this SQLite file when set (see predlog.py)
+PREDICTION_LOG_PATH = os.environ.get("MARGADARSHAK_PREDICTION_LOG")
+prediction_log = PredictionLog(PREDICTION_LOG_PATH) if PREDICTION_LOG_PATH else None
+
+# Live input drift against the training profile, when one was saved with the model
+reference_path = os.path.join(BASE_DIR, "reference_profile.json")
+DRIFT_WINDOW_SECONDS = float(os.environ.get("MARGADARSHAK_DRIFT_WINDOW", 3600))
+drift_monitor = (
+    DriftMonitor.from_file(reference_path, window_seconds=DRIFT_WINDOW_SECONDS)
+    if os.path.exists(reference_path) else None
+)
+
+# Per-worker state that endpoints report across all workers (drift windows,
+# profiling sessions) is shared through this SQLite file
+STATE_DB_PATH = os.environ.get("MARGADARSHAK_STATE_DB", os.path.join(BASE_DIR, "worker_state.sqlite3"))
+
+# CGPA rollups per program / year / living situation for /percentile (see cohorts.py)
+cohorts_path = os.path.join(BASE_DIR, "cohorts.npz")
+cohort_rollups = CohortRollups.load(cohorts_path) if os.path.exists(cohorts_path) else None
+
+model = None
+model_version = None
+lookup_table = None
+ensemble = None
+explainer = None
+_model_lock = threading.Lock()
+
+# Load model using cloudpickle
+def get_model():
+    global model, model_version, lookup_table, ensemble, explainer
+    if model is None:
+        with _model_lock:
+            if model is None:
+                import cloudpickle  # deferred: unpickling also imports sklearn
+                try:
+                    with open(model_path, "rb") as f:
+                        pickled = f.read()
+                    loaded = cloudpickle.loads(pickled)
+                except Exception as e:
+                    raise RuntimeError(f"❌ Error loading model.pkl: {e}")
+                model_version = hashlib.sha256(pickled).hexdigest()[:12]
+                if USE_LOOKUP_TABLE:
+                    lookup_table = PredictionTable(loaded)
+                if os.path.exists(ensemble_path):
+                    ensemble = LinearEnsemble.load(ensemble_path)
+                explainer = make_explainer(loaded, load_baseline(reference_path))
+                # Set last: callers skip the lock once model is set, so
+                # everything derived from it must be in place by then
+                model = loaded
+    return model
+
+if not LAZY_MODEL:
+    get_model()
+
+# Run one prediction end to end so the first real request doesn't pay for
+# model loading and first-call setup inside numpy/sklearn
+def warm_up():
+    score_one(InputData(
+        repeated_course=0,
+        attendance=80,
+        part_time_job=0,
+        motivation_level=5,
+        first_generation=0,
+        friends_performance=5
+    ))
 
-try:
-    with open(model_path, "rb") as f:
-        model = cloudpickle.load(f)
-except Exception as e:
-    raise RuntimeError(f"❌ Error loading model.pkl: {e}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up()
+    try:
+        jobs.init_store()
+    except Exception as e:
+        # Background jobs are optional: a broken job store only disables /jobs
+        print(f"❌ Job store unavailable, /jobs disabled: {e}", flush=True)
+    if prediction_log is not None:
+        prediction_log.start()
+    if drift_monitor is not None:
+        try:
+            drift_monitor.start(STATE_DB_PATH)
+        except Exception as e:
+            # /drift then reports only the requests this worker served
+            print(f"❌ Worker state store unavailable, /drift is per worker: {e}", flush=True)
+    if profiling.ADMIN_TOKEN:
+        profiling.instrument(app)
+        try:
+            profiling.sessions.open(STATE_DB_PATH)
+        except Exception as e:
+            print(f"❌ Worker state store unavailable, profiling is per worker: {e}", flush=True)
+    yield
+    jobs.shutdown()
+    if prediction_log is not None:
+        prediction_log.stop()
+    if drift_monitor is not None:
+        drift_monitor.stop()
+    if profiling.ADMIN_TOKEN:
+        profiling.sessions.close()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +176,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admin-only sampling profiler; not mounted at all unless a token is configured
+if profiling.ADMIN_TOKEN:
+    app.add_middleware(profiling.ProfilingMiddleware, profiler=profiling.profiler)
+    app.include_router(profiling.router)
+
+    @app.get("/admin/prediction-log", dependencies=[Depends(profiling.require_admin)])
+    def prediction_log_stats():
+        if prediction_log is None:
+            return {"enabled": False}
+        return {"enabled": True, **prediction_log.stats()}
+
 @app.get("/")
 def read_root():
     return {
@@ -56,84 +202,270 @@ class InputData(BaseModel):
     first_generation: int
     friends_performance: float
 
-# ✅ Recommendation logic
-def generate_recommendations(data, predicted_cgpa: float) -> list:
-    recs = []
-
-    # Define motivational quotes
-    quotes = {
-        "attendance": "80% of success is showing up. – Woody Allen",
-        "repeated_course": "Failure is simply the opportunity to begin again, this time more intelligently. – Henry Ford",
-        "part_time_job": "Balance is not something you find, it’s something you create. – Jana Kingsford",
-        "motivation": "Start where you are. Use what you have. Do what you can. – Arthur Ashe",
-        "friends": "Surround yourself with those who lift you higher. – Oprah Winfrey",
-        "high_performance": "Excellence is not a skill, it’s an attitude. – Ralph Marston",
-        "improve": "Progress, not perfection. – Unknown",
-        "risk": "Small steps every day lead to big results. – Unknown",
-        "critical": "Every setback is a setup for a comeback. – Willie Jolley"
-    }
+# ✅ Batch input schema: one list per field, validated in a single pass
+MAX_BATCH_ROWS = 10000
+
+class BatchInputData(BaseModel):
+    repeated_course: List[int]
+    attendance: List[float]
+    part_time_job: List[int]
+    motivation_level: List[float]
+    first_generation: List[int]
+    friends_performance: List[float]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        lengths = {len(getattr(self, name)) for name in FEATURES}
+        if len(lengths) != 1:
+            raise ValueError("all fields must have the same number of rows")
+        if lengths.pop() > MAX_BATCH_ROWS:
+            raise ValueError(f"at most {MAX_BATCH_ROWS} rows per batch")
+        return self
+
+# ✅ Graduation simulation input (the Results page form) and sampler settings
+class SimulationInput(BaseModel):
+    gpa: float = Field(ge=0, le=4)
+    credits_completed: float = Field(ge=0)
+    courses_failed: float = Field(ge=0)
+    study_hours: float = Field(ge=0)
+    sleep_quality: float = Field(ge=0, le=10)
+    extracurriculars: float = Field(ge=0, le=10)
+    mental_health: float = Field(ge=0, le=10)
+    family_support: float = Field(ge=0, le=10)
+    social_activity: float = Field(ge=0, le=10)
+    method: Literal["plain", "antithetic", "stratified", "halton", "sobol"] = "stratified"
+    target_width: float = Field(0.01, gt=0, le=1)
+    max_draws: int = Field(200_000, ge=8192, le=5_000_000)
+    seed: Optional[int] = None
 
-    # Conditional recommendations with quotes
-    if data.attendance < 70:
-        recs.append("Try to attend more classes to stay on track academically.")
-        recs.append(quotes["attendance"])
+class CohortSimulationInput(BaseModel):
+    students: List[SimulationInput] = Field(min_length=1)
 
-    if data.repeated_course == 1:
-        recs.append("Focus on understanding the subjects you've repeated for better mastery.")
-        recs.append(quotes["repeated_course"])
+# ✅ Feature vector in the column order the model was trained on
+def build_features(data: InputData) -> np.ndarray:
+    return np.array([feature_row(data)])
 
-    if data.part_time_job == 1 and predicted_cgpa < 2.5:
-        recs.append("Consider adjusting your part-time work hours to reduce academic stress.")
-        recs.append(quotes["part_time_job"])
+def build_batch_features(batch: BatchInputData) -> np.ndarray:
+    return np.column_stack([np.asarray(getattr(batch, name), dtype=float) for name in FEATURES])
 
-    if data.motivation_level < 5:
-        recs.append("Boost your motivation by setting short-term goals and tracking your progress.")
-        recs.append(quotes["motivation"])
 
-    if data.friends_performance < 2.5:
-        recs.append("Engage with peers who are academically focused to stay motivated.")
-        recs.append(quotes["friends"])
+# ✅ Clipped CGPA and recommendation mask for one student
+def score_one(data: InputData):
+    hit = lookup_table.lookup(feature_row(data)) if lookup_table is not None else None
+    if hit is not None:
+        return hit
+    features = build_features(data)
+    prediction = clip_prediction(get_model().predict(features)[0])
+    return prediction, mask_from_ids(recommendation_ids(data, prediction))
 
-    # Overall CGPA feedback
-    if predicted_cgpa >= 3.5:
-        recs.append("Great work! Keep up the consistent performance.")
-        recs.append(quotes["high_performance"])
-    elif predicted_cgpa >= 2.75:
-        recs.append("You're passing, but there’s room to improve further.")
-        recs.append(quotes["improve"])
-    elif predicted_cgpa >= 2.5:
-        recs.append("You're at risk. Focus on key habits to improve your academic standing.")
-        recs.append(quotes["risk"])
-    else:
-        recs.append("Critical risk of not graduating. Seek support and take active steps toward improvement.")
-        recs.append(quotes["critical"])
 
-    return recs
+# ✅ Bootstrap prediction intervals, appended to the usual response body
+def interval_fields(features: np.ndarray, level: float, single: bool) -> dict:
+    get_model()
+    if ensemble is None:
+        raise HTTPException(status_code=400, detail="No bootstrap ensemble loaded (train with --bootstrap K)")
+    low, high, p_pass = ensemble.summarize(features, level)
+    if single:
+        return {"interval": {"low": float(low[0]), "high": float(high[0]), "level": level}, "p_pass": float(p_pass[0])}
+    return {"interval": {"low": low.tolist(), "high": high.tolist(), "level": level}, "p_pass": p_pass.tolist()}
+
+
+# ✅ Per-feature contributions, from the same pass that produces the prediction
+def require_explainer():
+    get_model()
+    if explainer is None:
+        raise HTTPException(status_code=400, detail=f"No explanations for {type(model).__name__} models")
+    return explainer
+
+
+def explain_one(data: InputData):
+    raw, contributions = explainer.explain(build_features(data))
+    prediction = clip_prediction(raw[0])
+    return prediction, mask_from_ids(recommendation_ids(data, prediction)), contributions
 
 
 # ✅ Prediction endpoint with recommendation
 @app.post("/predict")
-def predict(data: InputData):
+def predict(data: InputData, intervals: bool = False, level: float = Query(0.9, gt=0, lt=1), explain: bool = False):
+    extra = interval_fields(np.array([feature_row(data)]), level, single=True) if intervals else None
+    if explain:
+        require_explainer()
+    try:
+        started = time.perf_counter()
+        if explain:
+            prediction, mask, contributions = explain_one(data)
+            extra = {**(extra or {}), **contribution_fields(explainer, contributions, single=True)}
+        else:
+            prediction, mask = score_one(data)
+        if drift_monitor is not None:
+            drift_monitor.observe(feature_row(data))
+        if prediction_log is not None:
+            latency_ms = (time.perf_counter() - started) * 1000
+            prediction_log.record(feature_row(data), prediction, mask, model_version, latency_ms)
+
+        # Same body as {"predicted_cgpa": ..., "recommendations": [...]}, pre-encoded
+        return PreEncodedJSONResponse(prediction_json(prediction, mask, extra))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ Batch prediction: {"predicted_cgpa": [...], "recommendations": [[...], ...]} in row order
+@app.post("/predict/batch")
+def predict_batch(
+    batch: BatchInputData, intervals: bool = False, level: float = Query(0.9, gt=0, lt=1), explain: bool = False
+):
+    features = build_batch_features(batch)
+    extra = interval_fields(features, level, single=False) if intervals else None
+    if explain:
+        require_explainer()
+    try:
+        started = time.perf_counter()
+        if len(features) == 0:
+            if explain:
+                extra = {**(extra or {}), **contribution_fields(explainer, features, single=False)}
+            return {"predicted_cgpa": [], "recommendations": [], **(extra or {})}
+        if explain:
+            raw, contributions = explainer.explain(features)
+            predicted, masks = score_predictions(raw, features)
+            extra = {**(extra or {}), **contribution_fields(explainer, contributions, single=False)}
+        else:
+            predicted, masks = score_matrix(get_model(), features)
+        if drift_monitor is not None:
+            drift_monitor.observe_many(features)
+        if prediction_log is not None:
+            latency_ms = (time.perf_counter() - started) * 1000 / len(features)
+            prediction_log.record_many(features, predicted, masks, model_version, latency_ms)
+        return PreEncodedJSONResponse(batch_prediction_json(predicted, masks, extra))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ What-if: cheapest attendance / motivation / part-time changes per CGPA band
+@app.post("/whatif")
+def whatif(data: InputData):
+    try:
+        return what_if(get_model(), feature_row(data))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ Monte Carlo graduation probability with adaptive stopping (see simulation.py)
+@app.post("/simulate")
+def simulate(data: SimulationInput):
     try:
-        features = np.array([[
-            data.repeated_course,
-            data.attendance,
-            data.part_time_job,
-            data.motivation_level,
-            data.first_generation,
-            data.friends_performance
-        ]])
-        prediction = model.predict(features)[0]
-
-        prediction = max(0.0, min(prediction, 4.0))
-        prediction = round(prediction, 2)
-
-        recommendations = generate_recommendations(data, prediction)
-
-        return {
-            "predicted_cgpa": prediction,
-            "recommendations": recommendations
-        }
+        score = base_score(**data.model_dump(exclude={"method", "target_width", "max_draws", "seed"}))
+        return simulate_graduation(
+            score,
+            method=data.method,
+            target_width=data.target_width,
+            max_draws=data.max_draws,
+            seed=data.seed
+        )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ Input drift scores per time window against the training profile (see drift.py)
+@app.get("/drift")
+def drift():
+    if drift_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **drift_monitor.report()}
+
+
+# ✅ Percentile rank of a CGPA within a cohort, e.g. BBIS 4th-year students
+@app.get("/percentile")
+def percentile(
+    cgpa: float = Query(ge=0, le=4),
+    program: Optional[str] = None,
+    year: Optional[str] = None,
+    living: Optional[str] = None,
+):
+    if cohort_rollups is None:
+        raise HTTPException(status_code=400, detail="No cohort rollups loaded (build them with cohorts.py)")
+    result = cohort_rollups.rank(cgpa, program, year, living)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown cohort, or too few students to rank against")
+    return result
+
+
+# ✅ Streaming bulk scoring for CSV / NDJSON / Arrow cohort files (see bulk.py)
+app.add_route("/predict/bulk", BulkScoringApp(get_model), methods=["POST"])
+
+
+# ✅ Background jobs for big files and cohort simulations (see jobs.py)
+def require_jobs():
+    if not jobs.ready():
+        raise HTTPException(status_code=503, detail="Background jobs are unavailable")
+
+def job_or_404(job_id: str) -> dict:
+    require_jobs()
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs/bulk", status_code=202, dependencies=[Depends(require_jobs)])
+async def submit_bulk_job(request: Request, format: Optional[str] = None, output: str = "ndjson"):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    input_format = format or CONTENT_TYPES.get(content_type, "csv")
+    if input_format not in INPUT_FORMATS or output not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"format must be one of {INPUT_FORMATS}, output one of {OUTPUT_FORMATS}"
+        )
+
+    too_large = HTTPException(status_code=413, detail=f"Uploads are limited to {jobs.MAX_INPUT_BYTES} bytes")
+    if int(request.headers.get("content-length") or 0) > jobs.MAX_INPUT_BYTES:
+        raise too_large
+
+    job_id = jobs.new_job_id()
+    size = 0
+    try:
+        with open(jobs.input_path(job_id), "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > jobs.MAX_INPUT_BYTES:
+                    raise too_large
+                # Disk writes off the event loop: uploads can run to gigabytes
+                await run_in_threadpool(f.write, chunk)
+    except (ClientDisconnect, HTTPException):
+        os.remove(jobs.input_path(job_id))
+        raise
+    jobs.create_job(job_id, "bulk", {"format": input_format, "output": output})
+    jobs.submit(job_id, jobs.run_bulk_job, input_format, output)
+    return jobs.get_job(job_id)
+
+@app.post("/jobs/simulate", status_code=202, dependencies=[Depends(require_jobs)])
+def submit_simulation_job(data: CohortSimulationInput):
+    job_id = jobs.new_job_id()
+    with open(jobs.input_path(job_id), "w") as f:
+        json.dump([student.model_dump() for student in data.students], f)
+    jobs.create_job(job_id, "simulate", {}, total=len(data.students))
+    jobs.submit(job_id, jobs.run_simulation_job)
+    return jobs.get_job(job_id)
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = job_or_404(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    output = job["params"].get("output", "ndjson")
+    return FileResponse(jobs.result_path(job_id), media_type=MEDIA_TYPES[output])
+
+@app.post("/jobs/{job_id}/cancel", status_code=202)
+def cancel_job(job_id: str):
+    job = job_or_404(job_id)
+    if job["status"] not in jobs.FINISHED:
+        jobs.request_cancel(job_id)
+    return jobs.get_job(job_id)
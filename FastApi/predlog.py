@@ -0,0 +1,144 @@
+"""Append-only prediction log with a buffered, batched writer.
+
+/predict only appends a tuple to an in-memory buffer; a background thread
+drains it in batches, one transaction per batch, over a single SQLite
+connection (a local stand-in for the Supabase Postgres). SQLite serialises
+writers anyway, so a second connection would only wait on the first. When the
+buffer is full new records are dropped and counted rather than blocking the
+request, and the writer is woken early once a full batch is waiting.
+
+Enabled by pointing MARGADARSHAK_PREDICTION_LOG at a database file.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from scoring import FEATURES, ids_from_mask
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS prediction_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    {", ".join(f"{name} REAL NOT NULL" for name in FEATURES)},
+    predicted_cgpa REAL NOT NULL,
+    recommendation_ids TEXT NOT NULL,
+    model_version TEXT,
+    latency_ms REAL
+)
+"""
+INSERT = (
+    f"INSERT INTO prediction_log (created_at, {', '.join(FEATURES)}, predicted_cgpa, "
+    f"recommendation_ids, model_version, latency_ms) VALUES ({', '.join('?' * (len(FEATURES) + 5))})"
+)
+
+
+class PredictionLog:
+    def __init__(self, path: str, capacity: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+    # ---------- hot path ----------
+
+    def record(self, features, predicted_cgpa: float, mask: int, model_version: str, latency_ms: float) -> bool:
+        with self._lock:
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._buffer.append((time.time(), *features, predicted_cgpa, mask, model_version, latency_ms))
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def record_many(self, features, predicted, masks, model_version: str, latency_ms: float) -> int:
+        """Log a whole batch request; latency_ms is per row."""
+        now = time.time()
+        rows = [
+            (now, *row, cgpa, mask, model_version, latency_ms)
+            for row, cgpa, mask in zip(features.tolist(), predicted.tolist(), masks.tolist())
+        ]
+        with self._lock:
+            room = max(0, self.capacity - len(self._buffer))
+            self._buffer.extend(rows[:room])
+            self.dropped += len(rows) - min(room, len(rows))
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wake.set()
+        return min(room, len(rows))
+
+    # ---------- writer ----------
+
+    def start(self):
+        """Open the connection and start the writer; call once per worker process."""
+        # Used by the writer thread, then by stop() once that thread has exited
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def flush(self):
+        if self._conn is None:
+            return
+        while batch := self._take_batch():
+            rows = [
+                (*row[:-3], json.dumps(ids_from_mask(row[-3])), row[-2], row[-1])
+                for row in batch
+            ]
+            try:
+                with self._conn:
+                    self._conn.executemany(INSERT, rows)
+            except sqlite3.Error:
+                self.failed += len(rows)
+                continue
+            self.written += len(rows)
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
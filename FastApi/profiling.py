@@ -0,0 +1,434 @@
+"""Admin-gated sampling profiler for the prediction service.
+
+Nothing here is wired into the app unless MARGADARSHAK_ADMIN_TOKEN is set, so a
+normal deployment pays nothing for it. When enabled, a background thread
+samples the Python stacks of every worker thread and aggregates them into
+collapsed-stack lines ("outer;inner;leaf count") that flamegraph.pl,
+speedscope or inferno can render directly.
+
+The sampler is itself a Python thread, so it only runs when it holds the GIL.
+With the default 5 ms switch interval it would mostly get the GIL when a
+request thread released it for I/O, and every stack would end in a socket
+write. While a session runs, the interpreter's switch interval is lowered so
+the sampler can preempt busy threads in the middle of parsing, scoring and
+rendering. The old interval is restored when the session ends.
+
+In 1-in-N mode only the threads serving a sampled request are recorded: the
+event-loop thread while a sampled request's coroutine is on its stack, and a
+thread-pool thread while it runs a sampled request's sync endpoint.
+
+Under several workers a session must cover all of them, not only the one that
+answered /start. With SharedSessions.open(path) sessions are recorded in a
+shared SQLite file; a watcher thread in every worker starts and stops its own
+profiler to match and publishes its stack counts, which the read endpoints add
+up across workers.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import closing
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+
+ADMIN_TOKEN = os.environ.get("MARGADARSHAK_ADMIN_TOKEN")
+
+# Leaf frames of threads that are parked rather than doing work; sampling
+# them would bury the request path under event-loop and thread-pool idling.
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("base_events.py", "_run_once"),
+}
+
+# GIL switch interval while a session runs (the interpreter default is 5 ms)
+SESSION_SWITCH_INTERVAL = 0.0002
+
+# Set for the duration of a sampled request; copied into thread-pool calls
+_in_sampled_request = contextvars.ContextVar("in_sampled_request", default=False)
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_sessions (
+    id INTEGER PRIMARY KEY,
+    deadline REAL NOT NULL,
+    every INTEGER NOT NULL,
+    interval REAL NOT NULL,
+    stopped INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS profile_results (
+    session INTEGER NOT NULL,
+    worker TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    stacks TEXT NOT NULL,
+    PRIMARY KEY (session, worker)
+);
+"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapsed(stacks: Counter) -> str:
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _mode(every: int) -> str:
+    return f"1-in-{every} requests" if every else "window"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.every = 0
+        self.deadline = 0.0
+        self._seen = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._switch_interval = sys.getswitchinterval()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, every: int = 0):
+        """Sample for `seconds`; with every=N only while 1-in-N requests run."""
+        if self.running:
+            raise RuntimeError("a profiling session is already running")
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self._seen = 0
+            self._in_flight = 0
+        self.every = every
+        self.deadline = time.monotonic() + seconds
+        self._stop.clear()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, SESSION_SWITCH_INTERVAL))
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def request_started(self) -> bool:
+        """Called per request while a session runs; True if it is sampled."""
+        if not self.running or not self.every:
+            return False
+        with self._lock:
+            self._seen += 1
+            if self._seen % self.every:
+                return False
+            self._in_flight += 1
+        return True
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _run(self):
+        own = threading.get_ident()
+        try:
+            while not self._stop.is_set() and time.monotonic() < self.deadline:
+                if not self.every or self._in_flight > 0:
+                    self._sample(own)
+                self._stop.wait(self.interval)
+        finally:
+            sys.setswitchinterval(self._switch_interval)
+
+    def _sample(self, own: int):
+        collected = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if leaf in IDLE_LEAVES:
+                continue
+            stack = []
+            sampled = not self.every
+            while frame is not None:
+                if len(stack) < self.max_depth:
+                    stack.append(_frame_label(frame))
+                elif sampled:
+                    break
+                sampled = sampled or frame.f_code in SAMPLED_CODES
+                frame = frame.f_back
+            if sampled:
+                collected.append(";".join(reversed(stack)))
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(collected)
+
+    def snapshot(self):
+        with self._lock:
+            return self.samples, Counter(self.stacks)
+
+    def collapsed(self) -> str:
+        return _collapsed(self.snapshot()[1])
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "mode": _mode(self.every),
+            "remaining_seconds": max(0.0, round(self.deadline - time.monotonic(), 2)) if self.running else 0.0,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+        }
+
+
+class ProfilingMiddleware:
+    """Plain ASGI middleware so the per-request cost is a counter bump."""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.request_started():
+            await self.app(scope, receive, send)
+            return
+        await self._sampled(scope, receive, send)
+
+    async def _sampled(self, scope, receive, send):
+        # The sampler recognises this frame on the event-loop thread's stack
+        token = _in_sampled_request.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_sampled_request.reset(token)
+            self.profiler.request_finished()
+
+
+def _run_sampled(call, args, kwargs):
+    # The sampler recognises this frame on a thread-pool thread's stack
+    return call(*args, **kwargs)
+
+
+SAMPLED_CODES = frozenset({ProfilingMiddleware._sampled.__code__, _run_sampled.__code__})
+
+
+def _marking(call):
+    @functools.wraps(call)
+    def marked(*args, **kwargs):
+        if _in_sampled_request.get():
+            return _run_sampled(call, args, kwargs)
+        return call(*args, **kwargs)
+    marked.profiling_marked = True
+    return marked
+
+
+def instrument(app):
+    """Mark sync endpoints so 1-in-N sessions can see which thread serves a sampled request.
+
+    Call once every route is registered. Async endpoints need nothing: they run
+    under ProfilingMiddleware._sampled on the event-loop thread.
+    """
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        call = route.dependant.call
+        if not asyncio.iscoroutinefunction(call) and not getattr(call, "profiling_marked", False):
+            route.dependant.call = _marking(call)
+
+
+class SharedSessions:
+    """Profiling sessions that every worker process takes part in.
+
+    Without open() this is a thin front for the local profiler.
+    """
+
+    def __init__(self, profiler: SamplingProfiler, poll: float = 0.5):
+        self.profiler = profiler
+        self.poll = poll
+        self.path = None
+        self._worker = None
+        self._session = None
+        self._published = True
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self, path: str):
+        """Join sessions recorded in path; call once per worker process."""
+        with closing(self._connect(path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(STORE_SCHEMA)
+        self.path = path
+        self._worker = uuid.uuid4().hex
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-sessions", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.profiler.stop()
+        if self.path is not None:
+            self.sync()
+
+    @staticmethod
+    def _connect(path: str):
+        return sqlite3.connect(path, timeout=30, isolation_level=None)
+
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            try:
+                self.sync()
+            except sqlite3.Error:
+                pass  # try again on the next poll
+
+    @staticmethod
+    def _latest(conn):
+        return conn.execute(
+            "SELECT id, deadline, every, interval, stopped FROM profile_sessions ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+
+    def sync(self):
+        """Match the local profiler to the latest session and publish its stacks."""
+        with self._lock, closing(self._connect(self.path)) as conn:
+            latest = self._latest(conn)
+            if latest is not None:
+                session, deadline, every, interval, stopped = latest
+                remaining = deadline - time.time()
+                if session != self._session and not stopped and remaining > 0:
+                    self.profiler.stop()
+                    self.profiler.interval = interval
+                    self.profiler.start(remaining, every)
+                    self._session, self._published = session, False
+                elif session == self._session and stopped:
+                    self.profiler.stop()
+            if self._session is not None and not self._published:
+                running = self.profiler.running
+                samples, stacks = self.profiler.snapshot()
+                conn.execute(
+                    "INSERT OR REPLACE INTO profile_results VALUES (?, ?, ?, ?)",
+                    (self._session, self._worker, samples, json.dumps(stacks)),
+                )
+                # Once the local session is over its last counts are out
+                self._published = not running
+
+    def begin(self, seconds: float, every: int, interval: float):
+        if self.path is None:
+            self.profiler.interval = interval
+            self.profiler.start(seconds, every)
+            return
+        now = time.time()
+        with closing(self._connect(self.path)) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(
+                "SELECT 1 FROM profile_sessions WHERE stopped = 0 AND deadline > ?", (now,)
+            ).fetchone():
+                raise RuntimeError("a profiling session is already running")
+            session = conn.execute(
+                "INSERT INTO profile_sessions (deadline, every, interval) VALUES (?, ?, ?)",
+                (now + seconds, every, interval),
+            ).lastrowid
+            # Only the latest session is ever reported
+            conn.execute("DELETE FROM profile_sessions WHERE id < ?", (session,))
+            conn.execute("DELETE FROM profile_results WHERE session < ?", (session,))
+        self.sync()
+
+    def end(self):
+        if self.path is None:
+            self.profiler.stop()
+            return
+        with closing(self._connect(self.path)) as conn:
+            conn.execute("UPDATE profile_sessions SET stopped = 1 WHERE id = (SELECT MAX(id) FROM profile_sessions)")
+        self.sync()
+
+    def _results(self):
+        """Latest session and the stack counts of every worker in it."""
+        self.sync()
+        with closing(self._connect(self.path)) as conn:
+            latest = self._latest(conn)
+            rows = conn.execute(
+                "SELECT samples, stacks FROM profile_results WHERE session = ?", (latest[0] if latest else None,)
+            ).fetchall()
+        samples, stacks = 0, Counter()
+        for worker_samples, worker_stacks in rows:
+            samples += worker_samples
+            stacks.update(json.loads(worker_stacks))
+        return latest, len(rows), samples, stacks
+
+    def status(self) -> dict:
+        if self.path is None:
+            return self.profiler.status()
+        latest, workers, samples, stacks = self._results()
+        remaining = 0.0
+        if latest is not None and not latest[4]:
+            remaining = max(0.0, round(latest[1] - time.time(), 2))
+        return {
+            "running": remaining > 0,
+            "mode": _mode(latest[2] if latest else 0),
+            "remaining_seconds": remaining,
+            "samples": samples,
+            "distinct_stacks": len(stacks),
+            "workers": workers,
+        }
+
+    def collapsed(self) -> str:
+        if self.path is None:
+            return self.profiler.collapsed()
+        return _collapsed(self._results()[3])
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+profiler = SamplingProfiler()
+sessions = SharedSessions(profiler)
+router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin)])
+
+
+@router.post("/start")
+def start_profile(
+    seconds: float = Query(10.0, gt=0, le=600),
+    every: int = Query(0, ge=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    try:
+        sessions.begin(seconds, every, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return sessions.status()
+
+
+@router.post("/stop")
+def stop_profile():
+    sessions.end()
+    return sessions.status()
+
+
+@router.get("/status")
+def profile_status():
+    return sessions.status()
+
+
+@router.get("", response_class=PlainTextResponse)
+def profile_collapsed():
+    return sessions.collapsed()
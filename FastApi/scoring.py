@@ -0,0 +1,139 @@
+"""Feature layout and recommendation rules shared by every scoring path.
+
+Recommendations are identified by a small integer id so that vectorized paths
+(lookup table, bulk scoring) can carry them around as a bitmask and only turn
+them into text at the edge. Ids are stable: append new ones, never renumber.
+"""
+import numpy as np
+
+# Column order the model was trained on (see train_and_save_model.py)
+FEATURES = (
+    "repeated_course",
+    "attendance",
+    "part_time_job",
+    "motivation_level",
+    "first_generation",
+    "friends_performance",
+)
+REPEATED_COURSE, ATTENDANCE, PART_TIME_JOB, MOTIVATION_LEVEL, FIRST_GENERATION, FRIENDS_PERFORMANCE = range(6)
+
+# Columns InputData declares as int; everything else is a float
+INTEGER_FEATURES = (REPEATED_COURSE, PART_TIME_JOB, FIRST_GENERATION)
+
+# Define motivational quotes
+QUOTES = {
+    "attendance": "80% of success is showing up. – Woody Allen",
+    "repeated_course": "Failure is simply the opportunity to begin again, this time more intelligently. – Henry Ford",
+    "part_time_job": "Balance is not something you find, it’s something you create. – Jana Kingsford",
+    "motivation": "Start where you are. Use what you have. Do what you can. – Arthur Ashe",
+    "friends": "Surround yourself with those who lift you higher. – Oprah Winfrey",
+    "high_performance": "Excellence is not a skill, it’s an attitude. – Ralph Marston",
+    "improve": "Progress, not perfection. – Unknown",
+    "risk": "Small steps every day lead to big results. – Unknown",
+    "critical": "Every setback is a setup for a comeback. – Willie Jolley"
+}
+
+# (recommendation, quote) per id, in the order they are returned
+RECOMMENDATIONS = (
+    ("Try to attend more classes to stay on track academically.", QUOTES["attendance"]),
+    ("Focus on understanding the subjects you've repeated for better mastery.", QUOTES["repeated_course"]),
+    ("Consider adjusting your part-time work hours to reduce academic stress.", QUOTES["part_time_job"]),
+    ("Boost your motivation by setting short-term goals and tracking your progress.", QUOTES["motivation"]),
+    ("Engage with peers who are academically focused to stay motivated.", QUOTES["friends"]),
+    ("Great work! Keep up the consistent performance.", QUOTES["high_performance"]),
+    ("You're passing, but there’s room to improve further.", QUOTES["improve"]),
+    ("You're at risk. Focus on key habits to improve your academic standing.", QUOTES["risk"]),
+    ("Critical risk of not graduating. Seek support and take active steps toward improvement.", QUOTES["critical"]),
+)
+REC_ATTENDANCE, REC_REPEATED, REC_PART_TIME, REC_MOTIVATION, REC_FRIENDS, REC_HIGH, REC_IMPROVE, REC_RISK, REC_CRITICAL = range(9)
+
+# Overall CGPA bands, highest first
+CGPA_BANDS = ((3.5, REC_HIGH), (2.75, REC_IMPROVE), (2.5, REC_RISK))
+
+
+def feature_row(data) -> tuple:
+    return tuple(getattr(data, name) for name in FEATURES)
+
+
+def clip_prediction(prediction: float) -> float:
+    prediction = max(0.0, min(float(prediction), 4.0))
+    return round(prediction, 2)
+
+
+def clip_predictions(predictions: np.ndarray) -> np.ndarray:
+    """Vectorized clip_prediction; rounds through whole centi-points."""
+    return np.rint(np.clip(predictions, 0.0, 4.0) * 100) / 100
+
+
+def recommendation_ids(data, predicted_cgpa: float) -> list:
+    ids = []
+    if data.attendance < 70:
+        ids.append(REC_ATTENDANCE)
+    if data.repeated_course == 1:
+        ids.append(REC_REPEATED)
+    if data.part_time_job == 1 and predicted_cgpa < 2.5:
+        ids.append(REC_PART_TIME)
+    if data.motivation_level < 5:
+        ids.append(REC_MOTIVATION)
+    if data.friends_performance < 2.5:
+        ids.append(REC_FRIENDS)
+
+    # Overall CGPA feedback
+    for threshold, rec_id in CGPA_BANDS:
+        if predicted_cgpa >= threshold:
+            ids.append(rec_id)
+            break
+    else:
+        ids.append(REC_CRITICAL)
+    return ids
+
+
+def recommendation_masks(features: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+    """recommendation_ids for a (rows x FEATURES) matrix, as uint16 bitmasks."""
+    masks = (
+        (features[:, ATTENDANCE] < 70).astype(np.uint16) << REC_ATTENDANCE
+        | (features[:, REPEATED_COURSE] == 1).astype(np.uint16) << REC_REPEATED
+        | ((features[:, PART_TIME_JOB] == 1) & (predicted < 2.5)).astype(np.uint16) << REC_PART_TIME
+        | (features[:, MOTIVATION_LEVEL] < 5).astype(np.uint16) << REC_MOTIVATION
+        | (features[:, FRIENDS_PERFORMANCE] < 2.5).astype(np.uint16) << REC_FRIENDS
+    )
+    overall = np.select(
+        [predicted >= threshold for threshold, _ in CGPA_BANDS],
+        [rec_id for _, rec_id in CGPA_BANDS],
+        REC_CRITICAL,
+    )
+    return masks | (np.uint16(1) << overall.astype(np.uint16))
+
+
+def score_predictions(raw: np.ndarray, features: np.ndarray):
+    """(clipped predicted CGPA, recommendation masks) from raw model output."""
+    predicted = clip_predictions(raw)
+    return predicted, recommendation_masks(features, predicted)
+
+
+def score_matrix(model, features: np.ndarray):
+    """(clipped predicted CGPA, recommendation masks) for a feature matrix."""
+    return score_predictions(model.predict(features), features)
+
+
+def mask_from_ids(ids) -> int:
+    mask = 0
+    for rec_id in ids:
+        mask |= 1 << rec_id
+    return mask
+
+
+def ids_from_mask(mask: int) -> list:
+    return [rec_id for rec_id in range(len(RECOMMENDATIONS)) if mask >> rec_id & 1]
+
+
+def render_recommendations(ids) -> list:
+    recs = []
+    for rec_id in ids:
+        recs.extend(RECOMMENDATIONS[rec_id])
+    return recs
+
+
+# ✅ Recommendation logic
+def generate_recommendations(data, predicted_cgpa: float) -> list:
+    return render_recommendations(recommendation_ids(data, predicted_cgpa))
@@ -0,0 +1,68 @@
+"""Pre-encoded JSON for prediction responses.
+
+A /predict response is one float plus a list of recommendation strings, and
+those strings only ever come from scoring.RECOMMENDATIONS. Every possible list
+is encoded once at import (128 masks), so building a response is a bytes
+format instead of jsonable_encoder + json.dumps on every request. Output is
+byte-for-byte what Starlette's JSONResponse would send for the same dict.
+"""
+import json
+from itertools import combinations
+
+from fastapi.responses import JSONResponse, Response
+
+from scoring import CGPA_BANDS, REC_CRITICAL, RECOMMENDATIONS, ids_from_mask, mask_from_ids, render_recommendations
+
+try:
+    import orjson  # noqa: F401  ORJSONResponse needs it at render time
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+
+def _encode(value) -> bytes:
+    # Same settings as starlette.responses.JSONResponse.render
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _possible_masks():
+    conditional = [rec_id for rec_id in range(len(RECOMMENDATIONS))
+                   if rec_id not in {band_id for _, band_id in CGPA_BANDS} | {REC_CRITICAL}]
+    overall = [band_id for _, band_id in CGPA_BANDS] + [REC_CRITICAL]
+    for size in range(len(conditional) + 1):
+        for subset in combinations(conditional, size):
+            for band_id in overall:
+                yield mask_from_ids(subset + (band_id,))
+
+
+RECOMMENDATION_FRAGMENTS = {
+    mask: _encode(render_recommendations(ids_from_mask(mask))) for mask in _possible_masks()
+}
+
+
+def recommendations_json(mask: int) -> bytes:
+    fragment = RECOMMENDATION_FRAGMENTS.get(mask)
+    if fragment is None:
+        fragment = _encode(render_recommendations(ids_from_mask(mask)))
+    return fragment
+
+
+def _extra_fields(extra) -> bytes:
+    # Optional keys appended after the fixed ones, e.g. prediction intervals
+    return b"," + _encode(extra)[1:-1] if extra else b""
+
+
+def prediction_json(predicted_cgpa: float, mask: int, extra: dict = None) -> bytes:
+    return b'{"predicted_cgpa":%s,"recommendations":%s%s}' % (
+        repr(float(predicted_cgpa)).encode(), recommendations_json(mask), _extra_fields(extra)
+    )
+
+
+def batch_prediction_json(predicted, masks, extra: dict = None) -> bytes:
+    cgpa = ",".join(map(repr, predicted.tolist())).encode()
+    recs = b",".join(map(recommendations_json, masks.tolist()))
+    return b'{"predicted_cgpa":[%s],"recommendations":[%s]%s}' % (cgpa, recs, _extra_fields(extra))
+
+
+class PreEncodedJSONResponse(Response):
+    media_type = "application/json"
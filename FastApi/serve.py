@@ -0,0 +1,151 @@
+"""Preforking launcher for the CGPA predictor.
+
+The parent process imports the app, loads the model and runs a warm-up
+prediction once, then forks the workers. Everything loaded before the fork is
+shared copy-on-write, so each worker starts serving immediately and only pays
+resident memory for pages it actually writes to.
+
+    python serve.py --host 0.0.0.0 --port 10000 --workers 2
+
+Linux/macOS only (needs os.fork).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+START = time.perf_counter()
+# Worker exit status when the app never finished starting (lifespan startup
+# failed); restarting would only fail again, so the launcher stops instead
+STARTUP_FAILED = 3
+# A worker that dies sooner than this after its start is restarted with a
+# doubling delay, up to MAX_RESTART_DELAY seconds
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+def memory_mb() -> str:
+    """This process's proportional (Pss) and private memory.
+
+    Plain RSS counts every shared copy-on-write page in full in each worker,
+    so it hides exactly what the preforking saves.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.endswith("kB\n")}
+        private = fields["Private_Clean"] + fields["Private_Dirty"]
+        return f"pss {fields['Pss'] / 1024:.1f} MB, private {private / 1024:.1f} MB"
+    except (OSError, KeyError):
+        import resource
+        return f"max rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB"
+
+
+def log(message: str):
+    print(f"[serve {os.getpid()}] {message}", flush=True)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str):
+    import uvicorn
+
+    # The workers inherit the parent's SIGTERM/SIGINT handlers; uvicorn
+    # installs its own for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    class Server(uvicorn.Server):
+        async def startup(self, sockets=None):
+            # Ready means the app's lifespan startup has run and the socket is served
+            await super().startup(sockets=sockets)
+            if self.started:
+                log(f"worker ready after {time.perf_counter() - START:.3f}s, {memory_mb()}")
+
+    config = uvicorn.Config(app, log_level=log_level)
+    server = Server(config)
+    server.run(sockets=[sock])
+    os._exit(0 if server.started else STARTUP_FAILED)
+
+
+def spawn(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        run_worker(app, sock, log_level)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CGPA predictor with preforked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    import main as service
+
+    service.get_model()
+    service.warm_up()
+    log(f"model loaded and warmed in {time.perf_counter() - START:.3f}s, {memory_mb()}")
+
+    # Move everything allocated so far out of the collector's reach so the
+    # first gc pass in a worker doesn't touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    # pid -> start time
+    workers = {spawn(service.app, sock, args.log_level): time.monotonic() for _ in range(args.workers)}
+    stopping = False
+    status_code = 0
+    restart_delay = 0.0
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        if os.waitstatus_to_exitcode(status) == STARTUP_FAILED:
+            log(f"worker {pid} failed to start, stopping")
+            status_code = 1
+            shutdown(None, None)
+            continue
+        if time.monotonic() - started < MIN_UPTIME:
+            restart_delay = min(max(2 * restart_delay, 0.5), MAX_RESTART_DELAY)
+        else:
+            restart_delay = 0.0
+        log(f"worker {pid} exited with status {status}, restarting in {restart_delay:.1f}s")
+        time.sleep(restart_delay)
+        if not stopping:
+            workers[spawn(service.app, sock, args.log_level)] = time.monotonic()
+    sock.close()
+    return status_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
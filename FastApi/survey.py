@@ -0,0 +1,139 @@
+"""Normalization and deduplication for the student survey responses.
+
+Survey answers come in many spellings of one value ('BE' / 'B.E',
+'Btech AI' / 'B.Tech in AI', 'BPT' / 'Bpt', stray spaces and case). Grouping
+on the raw strings splits one program into several small groups. clean_survey
+fixes that before EDA or any model work:
+
+  * every categorical column is factorized once, so the string work runs over
+    the distinct spellings only and not per row; each spelling maps to a key
+    (case, punctuation and filler words dropped) and each key to one canonical
+    label: an entry in PROGRAM_ALIASES, else the key's most common spelling
+  * the rows are then relabelled with a single integer take over the codes and
+    stored as pandas categoricals, which keeps later group-bys and encodings
+    small
+  * repeat submissions are dropped by hashing each normalized row, ignoring the
+    timestamp, and keeping the first row per hash
+
+    python survey.py responses.csv -o responses_clean.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from survey_keys import CGPA, LIVING, PROGRAM, TIMESTAMP, YEAR, column_key, program_key, text_key  # noqa: F401
+
+# Short-answer columns; free-text comments are left as they are
+CATEGORICAL_COLUMNS = (
+    "Do you consent to participate in this academic research survey?",
+    PROGRAM,
+    YEAR,
+    LIVING,
+    "Have you ever given compart exam or repeated course?",
+    "Average attendance in semesters till now",
+    "Daily study hours (outside class including the time of assignments and projects)",
+    "Use of online platforms (YouTube, Coursera, etc.)",
+    "How often do you do group studies?",
+    "Do you ask for help with teachers while facing academic difficulties?",
+    "Average sleep per night",
+    "Do you feel supported by friends or family in your academics?",
+    "Estimated monthly household income (NPR)",
+    "Are you the first in your family to attend university?",
+    "Do you work a part-time job while studying?",
+    "Do family responsibilities affect your study time?",
+)
+
+# Canonical labels for program keys (see program_key) whose most common
+# spelling isn't the one to report
+PROGRAM_ALIASES = {
+    "be": "BE",
+    "btech": "B.Tech",
+    "btechai": "B.Tech AI",
+    "bsc": "BSc",
+    "bsccs": "BSc CS",
+    "bpt": "BPT",
+    "ballb": "BA LLB",
+    "bbmllb": "BBM LLB",
+}
+
+
+def normalize_column(values: pd.Series, key=text_key, aliases=None) -> pd.Categorical:
+    """Canonical categorical for a column of spellings; missing values stay missing."""
+    aliases = aliases or {}
+    codes, spellings = pd.factorize(values.astype("string").str.strip().replace("", pd.NA))
+    counts = np.bincount(codes[codes >= 0], minlength=len(spellings))
+
+    # Everything below is per distinct spelling, not per row
+    keys = [key(spelling) for spelling in spellings]
+    best = {}
+    for spelling, spelling_key, count in zip(spellings, keys, counts):
+        # Ties go to the spelling that sorts first, so 'BBA' beats 'Bba'
+        if spelling_key not in best or (-count, spelling) < best[spelling_key]:
+            best[spelling_key] = (-count, spelling)
+    labels = {spelling_key: aliases.get(spelling_key, spelling) for spelling_key, (_, spelling) in best.items()}
+    categories = sorted(set(labels.values()))
+    position = {label: i for i, label in enumerate(categories)}
+    remap = np.array([position[labels[spelling_key]] for spelling_key in keys] + [-1], dtype=np.int64)
+
+    # codes == -1 (missing) picks the trailing -1
+    return pd.Categorical.from_codes(remap[codes], categories=categories)
+
+
+def row_hashes(df: pd.DataFrame, ignore=(TIMESTAMP,)) -> np.ndarray:
+    """uint64 per row, equal for rows that match after normalization apart from `ignore`."""
+    columns = {}
+    for column in df.columns:
+        if column in ignore:
+            continue
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Hash keys, not labels: another batch may label the same key differently.
+            # One hash per category, then a take over the codes
+            keys = np.array([column_key(column)(label) for label in values.cat.categories] + [""], dtype=object)
+            values = pd.util.hash_array(keys)[values.cat.codes.to_numpy()]
+        columns[column] = values
+    return pd.util.hash_pandas_object(pd.DataFrame(columns, index=df.index), index=False).to_numpy()
+
+
+def drop_duplicate_submissions(df: pd.DataFrame, ignore=(TIMESTAMP,)) -> pd.DataFrame:
+    """Keep the first of each set of rows that are equal apart from `ignore`."""
+    return df[~pd.Series(row_hashes(df, ignore)).duplicated().to_numpy()]
+
+
+def clean_survey(df: pd.DataFrame):
+    """(cleaned frame, report) with categoricals normalized and repeats dropped."""
+    df = df.rename(columns=str.strip)
+    report = {"rows": len(df), "columns": {}}
+    for column in CATEGORICAL_COLUMNS:
+        if column not in df.columns:
+            continue
+        before = df[column].nunique()
+        df[column] = normalize_column(df[column], key=column_key(column), aliases=PROGRAM_ALIASES if column == PROGRAM else None)
+        report["columns"][column] = (before, len(df[column].cat.categories))
+    df = drop_duplicate_submissions(df).reset_index(drop=True)
+    report["duplicates"] = report["rows"] - len(df)
+    return df, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize and deduplicate survey responses")
+    parser.add_argument("input", help="survey responses CSV")
+    parser.add_argument("-o", "--output", required=True, help="cleaned CSV (or .parquet, keeps categoricals)")
+    args = parser.parse_args()
+
+    df, report = clean_survey(pd.read_csv(args.input))
+    if args.output.endswith(".parquet"):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False)
+
+    for column, (before, after) in report["columns"].items():
+        if after < before:
+            print(f"{column}: {before} -> {after} distinct values")
+    print(f"✅ {report['rows'] - report['duplicates']} of {report['rows']} rows kept "
+          f"({report['duplicates']} duplicate submissions) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Survey column names and answer keys, without pandas.
+
+survey.py cleans whole survey frames with pandas; the serving side
+(cohorts.py ranking a single CGPA) only needs to turn one answer into the
+same key, so these live here and the API process never imports pandas.
+"""
+import re
+
+TIMESTAMP = "Timestamp"
+PROGRAM = "Program or Field of Study (e.g., BSc CSIT, BBA, MBBS, etc.)"
+YEAR = "Current Year of Study"
+LIVING = "Living Situation"
+CGPA = "Current CGPA(average GPA that you remember) or Overall CGPA (if graduated)"
+
+_FILLER_WORDS = {"in", "of", "and"}
+_NOT_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def text_key(value: str) -> str:
+    """Case- and whitespace-insensitive key for a short answer."""
+    return " ".join(value.split()).casefold()
+
+
+def program_key(value: str) -> str:
+    """'B.Tech in AI', 'Btech AI' and 'BTECH  ai' all give 'btechai'."""
+    words = [word for word in value.casefold().split() if word not in _FILLER_WORDS]
+    return _NOT_ALPHANUMERIC.sub("", "".join(words))
+
+
+def column_key(column: str):
+    return program_key if column == PROGRAM else text_key
@@ -0,0 +1,97 @@
+"""FlatForest must predict exactly what the sklearn model it came from predicts.
+
+    python -m pytest FastApi/test_forest.py
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import (
+    AdaBoostRegressor,
+    BaggingRegressor,
+    ExtraTreesRegressor,
+    GradientBoostingRegressor,
+    HistGradientBoostingRegressor,
+    RandomForestRegressor,
+    VotingRegressor,
+)
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+from explain import TreeExplainer, make_explainer
+from forest import FlatForest
+from scoring import FEATURES
+
+SUPPORTED = [
+    DecisionTreeRegressor(random_state=0),
+    RandomForestRegressor(n_estimators=30, random_state=0),
+    ExtraTreesRegressor(n_estimators=30, random_state=0),
+    GradientBoostingRegressor(random_state=0),
+    HistGradientBoostingRegressor(max_iter=50, random_state=0),
+]
+
+
+def training_data(n=500):
+    """Integer-valued inputs on the API's ranges, like the real training set."""
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.integers(0, 2, n),      # repeated_course
+        rng.integers(30, 101, n),   # attendance
+        rng.integers(0, 2, n),      # part_time_job
+        rng.integers(1, 11, n),     # motivation_level
+        rng.integers(0, 2, n),      # first_generation
+        rng.integers(1, 11, n),     # friends_performance
+    ]).astype(float)
+    y = 1.5 + 0.02 * X[:, 1] + 0.1 * X[:, 3] - 0.3 * X[:, 0] + rng.normal(0, 0.2, n)
+    return X, y
+
+
+def probe_inputs():
+    X, _ = training_data()
+    rng = np.random.default_rng(1)
+    low, high = X.min(axis=0), X.max(axis=0)
+    return {
+        "grid": X[:200],
+        # Between the integer values the trees split on, including exact midpoints
+        "off_grid": np.vstack([X[:100] + rng.uniform(-0.5, 0.5, X[:100].shape), X[:100] + 0.5]),
+        "out_of_range": np.vstack([low - 100, high + 100, rng.uniform(low - 50, high + 50, (100, len(low)))]),
+    }
+
+
+@pytest.mark.parametrize("model", SUPPORTED, ids=lambda model: type(model).__name__)
+@pytest.mark.parametrize("inputs", ["grid", "off_grid", "out_of_range"])
+def test_predict_matches_sklearn(model, inputs):
+    X, y = training_data()
+    model.fit(X, y)
+    features = probe_inputs()[inputs]
+    np.testing.assert_allclose(FlatForest.from_sklearn(model).predict(features), model.predict(features), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("model", SUPPORTED, ids=lambda model: type(model).__name__)
+def test_contributions_add_up_to_prediction(model):
+    X, y = training_data()
+    model.fit(X, y)
+    explainer = TreeExplainer(model)
+    features = probe_inputs()["off_grid"]
+    raw, contributions = explainer.explain(features)
+    assert contributions.shape == (len(features), len(FEATURES))
+    np.testing.assert_allclose(explainer.base_value + contributions.sum(axis=1), model.predict(features), atol=1e-9)
+
+
+@pytest.mark.parametrize("model", [
+    BaggingRegressor(LinearRegression(), n_estimators=5, random_state=0),
+    BaggingRegressor(DecisionTreeRegressor(), n_estimators=5, random_state=0),
+    VotingRegressor([("linear", LinearRegression()), ("tree", DecisionTreeRegressor(random_state=0))]),
+    AdaBoostRegressor(n_estimators=5, random_state=0),
+    HistGradientBoostingRegressor(loss="poisson", max_iter=20, random_state=0),
+], ids=lambda model: type(model).__name__)
+def test_other_ensembles_are_rejected(model):
+    X, y = training_data()
+    model.fit(X, y)
+    with pytest.raises(TypeError):
+        FlatForest.from_sklearn(model)
+    assert make_explainer(model) is None
+
+
+def test_classifier_is_rejected():
+    X, y = training_data()
+    with pytest.raises(TypeError):
+        FlatForest.from_sklearn(DecisionTreeClassifier(random_state=0).fit(X, y > y.mean()))
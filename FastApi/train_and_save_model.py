@@ -1,6 +1,25 @@
+import argparse
+import json
+import os
 import cloudpickle
+from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 
+from drift import build_reference
+from ensemble import LinearEnsemble
+from forest import FlatForest
+
+parser = argparse.ArgumentParser(description="Train and save the CGPA model")
+parser.add_argument("--model", choices=("linear", "gbr"), default="linear",
+                    help="gbr saves gradient-boosted trees flattened for fast inference (forest.py)")
+parser.add_argument("--bootstrap", type=int, default=0, metavar="K",
+                    help="also fit K bootstrap models for prediction intervals (ensemble.npz)")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+if args.model == "gbr" and args.bootstrap:
+    # The bootstrap ensemble refits the linear model; its intervals would not describe the trees
+    parser.error("--bootstrap only applies to --model linear")
+
 # Sample data
 X = [
     [1, 90, 0, 7, 1, 8],
@@ -12,11 +31,29 @@ X = [
 y = [2.8, 3.1, 2.5, 3.9, 3.3]
 
 # Train model
-model = LinearRegression()
-model.fit(X, y)
+if args.model == "gbr":
+    model = FlatForest.from_sklearn(GradientBoostingRegressor(random_state=args.seed).fit(X, y))
+else:
+    model = LinearRegression()
+    model.fit(X, y)
 
 # Save model with cloudpickle
 with open("model.pkl", "wb") as f:
     cloudpickle.dump(model, f)
 
 print("✅ Model saved successfully as model.pkl")
+
+# Save the input distribution the model was trained on, for drift monitoring
+with open("reference_profile.json", "w") as f:
+    json.dump(build_reference(X), f, indent=2)
+
+print("✅ Reference profile saved as reference_profile.json")
+
+# Optional bootstrap ensemble, stacked into one coefficient matrix
+if args.bootstrap:
+    LinearEnsemble.fit_bootstrap(X, y, args.bootstrap, seed=args.seed).save("ensemble.npz")
+    print(f"✅ {args.bootstrap}-model bootstrap ensemble saved as ensemble.npz")
+elif os.path.exists("ensemble.npz"):
+    # Left over from an earlier model; the service would serve its intervals with this one
+    os.remove("ensemble.npz")
+    print("✅ Removed ensemble.npz from the previous model")
@@ -0,0 +1,88 @@
+"""What-if search: the cheapest slider changes that cross each CGPA band.
+
+For one student every combination of attendance (0-100), motivation (0-10)
+and part-time job (on/off) the student can actually move to is scored in a
+single vectorized model call, with the other answers held fixed. Only
+advice a student can act on is searched: attendance and motivation at or
+above their current values, and a part-time job only given up, never taken.
+For each recommendation threshold the student is still below
+(scoring.CGPA_BANDS: 2.5 / 2.75 / 3.5), the cheapest combination whose
+clipped prediction reaches it is returned.
+
+Cost is a rough effort scale: 10 attendance points, 1 motivation point and
+giving up a part-time job count as 1, 1 and 2.
+"""
+import numpy as np
+
+from scoring import ATTENDANCE, CGPA_BANDS, FEATURES, INTEGER_FEATURES, MOTIVATION_LEVEL, PART_TIME_JOB, clip_predictions
+
+# Per-unit cost of moving each adjustable feature
+CHANGE_COSTS = {
+    ATTENDANCE: 0.1,
+    MOTIVATION_LEVEL: 1.0,
+    PART_TIME_JOB: 2.0,
+}
+# Direction each feature may move in: +1 up only, -1 down only
+DIRECTIONS = {
+    ATTENDANCE: 1,
+    MOTIVATION_LEVEL: 1,
+    PART_TIME_JOB: -1,
+}
+
+_values = np.meshgrid(
+    np.arange(0, 101, dtype=float),  # attendance
+    np.arange(0, 11, dtype=float),   # motivation_level
+    np.array([0.0, 1.0]),            # part_time_job
+    indexing="ij",
+)
+PERTURBATIONS = dict(zip((ATTENDANCE, MOTIVATION_LEVEL, PART_TIME_JOB), (v.ravel() for v in _values)))
+
+THRESHOLDS = sorted(threshold for threshold, _ in CGPA_BANDS)
+
+
+def _value(column: int, value: float):
+    return int(value) if column in INTEGER_FEATURES else float(value)
+
+
+def what_if(model, row) -> dict:
+    base = np.asarray(row, dtype=float)
+    allowed = np.logical_and.reduce([
+        DIRECTIONS[column] * (values - base[column]) >= 0 for column, values in PERTURBATIONS.items()
+    ])
+
+    # Row 0 is the student as-is, the rest is the allowed part of the grid
+    grid = np.tile(base, (int(allowed.sum()) + 1, 1))
+    for column, values in PERTURBATIONS.items():
+        grid[1:, column] = values[allowed]
+    predicted = clip_predictions(model.predict(grid))
+    current, grid, predicted = float(predicted[0]), grid[1:], predicted[1:]
+
+    cost = np.zeros(len(grid))
+    for column, unit_cost in CHANGE_COSTS.items():
+        cost += np.abs(grid[:, column] - base[column]) * unit_cost
+
+    targets = []
+    for threshold in THRESHOLDS:
+        if current >= threshold:
+            targets.append({"threshold": threshold, "reached": True})
+            continue
+        candidates = np.flatnonzero(predicted >= threshold)
+        if len(candidates) == 0:
+            targets.append({"threshold": threshold, "reached": False, "reachable": False})
+            continue
+        # Cheapest first, higher prediction breaks ties
+        best = candidates[np.lexsort((-predicted[candidates], cost[candidates]))[0]]
+        targets.append({
+            "threshold": threshold,
+            "reached": False,
+            "reachable": True,
+            "changes": {
+                FEATURES[column]: _value(column, grid[best, column])
+                for column in PERTURBATIONS
+                if grid[best, column] != base[column]
+            },
+            "predicted_cgpa": float(predicted[best]),
+            "cost": round(float(cost[best]), 2),
+        })
+
+    return {"predicted_cgpa": current, "targets": targets}